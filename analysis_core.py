@@ -0,0 +1,289 @@
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+
+from file_poller import FilePoller
+from file_registry import FileRegistry, GeminiFileBackend, sha256_file
+from governor import GovernedFileBackend, Governor
+from hash_index import NearDuplicateIndex
+from history_store import HistoryStore, make_thumbnail
+from image_pipeline import ImagePipeline
+from media_store import MediaStore
+from metrics import span
+from response_cache import ResponseCache, make_key
+from search_cache import SearchCache
+from singleflight import SingleFlight
+from streaming import chunk_text
+from transcode import Transcoder
+
+MODEL_ID = "gemini-2.0-flash-exp"
+# Part of the response cache key, so changing the agent's tools invalidates cached answers
+TOOL_CONFIG = "duckduckgo"
+
+VIDEO_EXTENSIONS = {".mp4", ".mov", ".avi"}
+IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".jfif"}
+
+
+def build_agent(search_cache, model_id=MODEL_ID, history_turns=0):
+    # phi pulls in google.generativeai and duckduckgo_search, by far the slowest imports we have
+    from phi.agent import Agent
+    from phi.model.google import Gemini
+
+    from search_tools import CachedDuckDuckGo
+
+    return Agent(
+        name="Multimodal Analyst",
+        model=Gemini(id=model_id),
+        tools=[CachedDuckDuckGo(search_cache)],
+        markdown=True,
+        # Conversation agents replay their earlier turns; pooled agents stay stateless
+        add_history_to_messages=bool(history_turns),
+        num_history_responses=history_turns or 3,
+    )
+
+
+def clear_memory(agent):
+    # phi keeps every message an agent ran, images included, for as long as the agent lives
+    memory = getattr(agent, "memory", None)
+    if memory is not None:
+        memory.clear()
+
+
+class AgentPool:
+    """Hands every model call an agent of its own.
+
+    phi's Agent keeps the run in progress (run_response, memory, run_id) on
+    the instance, so two threads running one agent get each other's answers.
+    Agents are built on demand and reused once a call has given them back,
+    with their memory cleared so prompts and images don't pile up. They
+    share the Gemini client and the search cache, so an extra one costs
+    little. `first` may be a Future of an agent built in the background,
+    handed to the first call that needs one.
+    """
+
+    def __init__(self, factory, first=None):
+        self.factory = factory
+        self.created = 0
+        self._first = first
+        self._idle = []
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def checkout(self):
+        agent = self._take()
+        try:
+            yield agent
+        finally:
+            clear_memory(agent)
+            with self._lock:
+                self._idle.append(agent)
+
+    def stats(self):
+        with self._lock:
+            return {"agents": self.created + (self._first is not None), "idle": len(self._idle)}
+
+    def _take(self):
+        with self._lock:
+            if self._idle:
+                return self._idle.pop()
+            first, self._first = self._first, None
+        agent = first.result() if first is not None else self.factory()
+        with self._lock:
+            self.created += 1
+        return agent
+
+
+def video_prompt(question):
+    return f"""
+    First analyze this video and then answer the following question using both
+    the video analysis and web research: {question}
+
+    Provide a comprehensive response focusing on practical, actionable information.
+    """
+
+
+def media_kind(path):
+    suffix = Path(path).suffix.lower()
+    if suffix in VIDEO_EXTENSIONS:
+        return "video"
+    if suffix in IMAGE_EXTENSIONS:
+        return "image"
+    raise ValueError(f"Unsupported media type: {path}")
+
+
+@dataclass
+class AnalysisResult:
+    content: str
+    media_hash: str
+    cached: bool
+    seconds: float
+
+
+class AnalysisCore:
+    """The upload / preprocess / agent.run pipeline, independent of Streamlit.
+
+    The app, the batch CLI and the HTTP server all drive the same instance
+    type, so caching and upload reuse behave identically everywhere.
+    """
+
+    def __init__(self, agents, file_registry, file_poller, transcoder, image_pipeline, response_cache,
+                 governor=None, model_id=MODEL_ID, tool_config=TOOL_CONFIG, near_duplicates=None, history=None):
+        # AgentPool: model calls run concurrently, and an agent can only run one at a time
+        self.agents = agents
+        self.governor = governor or Governor()
+        self.file_registry = file_registry
+        self.file_poller = file_poller
+        self.transcoder = transcoder
+        self.image_pipeline = image_pipeline
+        self.response_cache = response_cache
+        self.model_id = model_id
+        self.tool_config = tool_config
+        # Optional NearDuplicateIndex: answers about an image are reused for near-identical copies
+        self.near_duplicates = near_duplicates
+        # Optional HistoryStore that keeps every answer for full-text search
+        self.history = history
+        # Identical (media, prompt, model) requests in flight at the same time share one model call
+        self.flights = SingleFlight()
+
+    @classmethod
+    def create(cls, work_dir=None, media_store=None):
+        work_dir = Path(work_dir or Path(tempfile.gettempdir()) / "multimodal_agent_media")
+        # Transcoded copies share the media store's disk quota
+        media_store = media_store or MediaStore(work_dir)
+        governor = Governor()
+        search_cache = SearchCache()
+        file_registry = FileRegistry(GovernedFileBackend(GeminiFileBackend(), governor))
+        return cls(
+            agents=AgentPool(lambda: build_agent(search_cache)),
+            file_registry=file_registry,
+            file_poller=FilePoller(file_registry.backend.get),
+            transcoder=Transcoder(work_dir / "transcoded", media_store=media_store),
+            image_pipeline=ImagePipeline(),
+            response_cache=ResponseCache(),
+            governor=governor,
+            near_duplicates=NearDuplicateIndex(),
+            history=HistoryStore(),
+        )
+
+    def cache_key(self, media_hash, question, variant=""):
+        return make_key(media_hash, question, self.model_id, self.tool_config + variant)
+
+    def image_media_hash(self, renditions):
+        # The hash answers are cached under: the first near-identical image's, if one was seen
+        if self.near_duplicates is None or renditions.phash is None:
+            return renditions.sha256
+        with span("near_duplicate") as lookup:
+            media_hash = self.near_duplicates.canonical(renditions.sha256, renditions.phash, renditions.dhash)
+            lookup.cache_hit = media_hash != renditions.sha256
+        return media_hash
+
+    def run_agent(self, prompt, stream=False, **run_kwargs):
+        # Every model call goes through the governor; streams are retried only before their first chunk
+        if stream:
+            # The caller times streamed generation, since it alone sees the first and last chunk
+            return self._stream_agent(prompt, run_kwargs)
+        with span("generate"), self.agents.checkout() as agent:
+            return self.governor.call("generate", agent.run, prompt, **run_kwargs)
+
+    def _stream_agent(self, prompt, run_kwargs):
+        # The agent stays checked out until the stream is consumed or closed
+        with self.agents.checkout() as agent:
+            yield from self.governor.stream("generate", lambda: agent.run(prompt, stream=True, **run_kwargs))
+
+    def upload_video(self, path, digest, note=None):
+        # Transcode if needed, then reuse or upload the file and wait until Gemini has processed it
+        try:
+            with span("transcode") as transcode:
+                transcoded = self.transcoder.submit(path, digest).result()
+                transcode.bytes = transcoded.output_bytes
+                transcode.attrs["skipped"] = transcoded.skipped
+            if note is not None and not transcoded.skipped:
+                note(
+                    f"Transcoded {transcoded.source_bytes / 2**20:.1f} MiB to "
+                    f"{transcoded.output_bytes / 2**20:.1f} MiB before upload"
+                )
+            video_file = self.file_registry.get_or_upload(transcoded.path, transcoded.key)
+        finally:
+            # The transcoded file is held for us until it has been uploaded
+            self.transcoder.release(digest)
+        with span("processing_wait"):
+            video_file = self.file_poller.submit(video_file, transcoded.output_bytes).result()
+        self.file_registry.mark(transcoded.key, video_file)
+        return video_file
+
+    def run_video(self, path, digest, question, note=None, **run_kwargs):
+        video_file = self.upload_video(path, digest, note)
+        return self.run_agent(video_prompt(question), videos=[video_file], **run_kwargs)
+
+    def run_image(self, renditions, question, **run_kwargs):
+        # Hand the encoded JPEG to the model in memory, no temp file round trip
+        return self.run_agent(question, images=[renditions.model_jpeg], **run_kwargs)
+
+    def analyze_file(self, path, question):
+        # Blocking, non-streaming analysis of a file on disk, answered from the cache when possible
+        start = time.perf_counter()
+        if media_kind(path) == "image":
+            renditions = self.image_pipeline.prepare(Path(path).read_bytes())
+            media_hash = self.image_media_hash(renditions)
+            run = lambda: self.run_image(renditions, question)
+            record = dict(media_hash=media_hash, kind="image", prompt=question, thumbnail=make_thumbnail(renditions.preview))
+        else:
+            media_hash = sha256_file(path)
+            run = lambda: self.run_video(path, media_hash, question)
+            record = dict(media_hash=media_hash, kind="video", prompt=question)
+
+        key = self.cache_key(media_hash, question)
+        with span("response_cache") as lookup:
+            cached = self.response_cache.get(key)
+            lookup.cache_hit = cached is not None
+        if cached is not None:
+            return AnalysisResult(cached, media_hash, True, time.perf_counter() - start)
+        content, _ = self.run_once(key, run, record)
+        return AnalysisResult(content, media_hash, False, time.perf_counter() - start)
+
+    def run_once(self, key, run, record=None):
+        # (content, shared): only one caller per key runs the model; the rest wait for its answer or error
+        def call():
+            start = time.perf_counter()
+            content = run().content
+            self._store(key, content, record, time.perf_counter() - start)
+            return content
+        return self.flights.do(key, call)
+
+    def stream_once(self, key, run, record=None):
+        # Text chunks of the answer. The first caller for a key streams it from run(stream=True);
+        # identical requests arriving meanwhile wait and get the finished answer as one chunk
+        call, leader = self.flights.begin(key)
+        if not leader:
+            yield self.flights.wait(call)
+            return
+        start = time.perf_counter()
+        parts = []
+        try:
+            for chunk in run(stream=True):
+                text = chunk_text(chunk)
+                if text:
+                    parts.append(text)
+                    yield text
+            content = "".join(parts)
+            self._store(key, content, record, time.perf_counter() - start)
+        except GeneratorExit:
+            self.flights.finish(key, call, error=RuntimeError("The request streaming this answer went away; try again."))
+            raise
+        except BaseException as e:
+            self.flights.finish(key, call, error=e)
+            raise
+        self.flights.finish(key, call, content)
+
+    def _store(self, key, content, record, seconds):
+        self.response_cache.put(key, content)
+        if record is not None:
+            self.record_history(answer=content, seconds=seconds, **record)
+
+    def record_history(self, media_hash, kind, prompt, answer, seconds=None, timings=None, thumbnail=None, owner=None):
+        # Queued for the history writer thread; never blocks the caller on disk
+        if self.history is not None:
+            self.history.add(media_hash, kind, prompt, answer, self.model_id, seconds, timings, thumbnail, owner)
@@ -0,0 +1,249 @@
+"""Asynchronous HTTP API over the analysis core.
+
+    POST /v1/images?prompt=...[&stream=1]   body: raw image bytes
+    POST /v1/videos?prompt=...[&stream=1]   body: raw video bytes
+    GET  /healthz
+    GET  /metrics                            Prometheus text format
+
+One process holds one AnalysisCore, so its agent pool, the Gemini client and
+the upload/response caches are shared by every request; each analysis runs
+on an agent of its own. Identical requests in flight, streamed or not, share
+one model call. Request bodies are
+streamed straight into the media store; when all analysis slots and the
+wait queue are taken the server answers 503 with Retry-After instead of
+piling up work.
+
+    python api_server.py --port 8080 --max-concurrency 16
+"""
+import argparse
+import asyncio
+import json
+import os
+import threading
+import uuid
+from pathlib import Path
+
+import tornado.web
+
+from history_store import make_thumbnail
+from media_store import MediaStore
+from metrics import REGISTRY
+
+MAX_BODY_BYTES = int(os.getenv("API_MAX_BODY_BYTES", 2 * 1024 ** 3))
+VIDEO_SUFFIXES = {"video/quicktime": ".mov", "video/x-msvideo": ".avi"}
+
+
+class ConcurrencyGate:
+    """Admits up to `limit` analyses at once with a bounded wait queue behind them."""
+
+    def __init__(self, limit, max_waiting):
+        self.limit = limit
+        self.max_waiting = max_waiting
+        self.active = 0
+        self.waiting = 0
+        self.rejected = 0
+        self._semaphore = asyncio.Semaphore(limit)
+
+    def admit(self):
+        # Reserve a place or refuse right away; never queue unboundedly
+        if self.active + self.waiting >= self.limit + self.max_waiting:
+            self.rejected += 1
+            return False
+        self.waiting += 1
+        return True
+
+    def withdraw(self):
+        # Give back an admitted place that never made it to the semaphore
+        self.waiting -= 1
+
+    async def __aenter__(self):
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self.waiting -= 1
+        self.active += 1
+
+    async def __aexit__(self, *exc):
+        self.active -= 1
+        self._semaphore.release()
+
+
+async def iterate_in_thread(make_iterator):
+    # Drive a blocking iterator (agent.run(stream=True)) on a worker thread and yield its items here
+    loop = asyncio.get_running_loop()
+    queue = asyncio.Queue(maxsize=64)
+    done = object()
+    stop = threading.Event()
+
+    def produce():
+        try:
+            for item in make_iterator():
+                if stop.is_set():
+                    break
+                asyncio.run_coroutine_threadsafe(queue.put(item), loop).result()
+        except BaseException as e:
+            asyncio.run_coroutine_threadsafe(queue.put(e), loop).result()
+        else:
+            asyncio.run_coroutine_threadsafe(queue.put(done), loop).result()
+
+    producer = loop.run_in_executor(None, produce)
+    try:
+        while True:
+            item = await queue.get()
+            if item is done:
+                break
+            if isinstance(item, BaseException):
+                raise item
+            yield item
+    finally:
+        stop.set()
+        # Unblock a producer waiting on a full queue
+        while not queue.empty():
+            queue.get_nowait()
+        await asyncio.wait([producer], timeout=0)
+
+
+class HealthHandler(tornado.web.RequestHandler):
+    def get(self):
+        gate = self.settings["gate"]
+        self.write({"status": "ok", "active": gate.active, "waiting": gate.waiting, "rejected": gate.rejected})
+
+
+class MetricsHandler(tornado.web.RequestHandler):
+    def get(self):
+        self.set_header("Content-Type", "text/plain; version=0.0.4")
+        self.write(REGISTRY.render())
+
+
+@tornado.web.stream_request_body
+class AnalyzeHandler(tornado.web.RequestHandler):
+    def initialize(self, kind):
+        self.kind = kind
+        self.spool = None
+        self.admitted = False
+        self.entered = False
+
+    def prepare(self):
+        self.request.connection.set_max_body_size(MAX_BODY_BYTES)
+        self.prompt = self.get_query_argument("prompt", "").strip()
+        if not self.prompt:
+            raise tornado.web.HTTPError(400, reason="Missing prompt")
+        if not self.settings["gate"].admit():
+            self.set_header("Retry-After", "5")
+            raise tornado.web.HTTPError(503, reason="Too many analyses in progress")
+        self.admitted = True
+        suffix = ".jpg" if self.kind == "image" else VIDEO_SUFFIXES.get(self.request.headers.get("Content-Type"), ".mp4")
+        self.suffix = suffix
+        self.spool = self.settings["media_store"].writer(suffix)
+
+    def data_received(self, chunk):
+        self.spool.write(chunk)
+
+    def on_connection_close(self):
+        # Client went away mid-upload
+        if self.spool is not None:
+            self.spool.abort()
+            self.spool = None
+        self._release_admission()
+
+    def on_finish(self):
+        self._release_admission()
+
+    def _release_admission(self):
+        if self.admitted and not self.entered:
+            self.settings["gate"].withdraw()
+        self.admitted = False
+
+    async def post(self):
+        core = self.settings["core"]
+        media_store = self.settings["media_store"]
+        gate = self.settings["gate"]
+        request_id = f"api-{uuid.uuid4().hex}"
+        spooled = self.spool.close()
+        self.spool = None
+        ref = media_store.adopt(request_id, self.kind, request_id, spooled, self.suffix)
+        stream = self.get_query_argument("stream", "0") in ("1", "true")
+
+        try:
+            self.entered = True
+            async with gate:
+                if self.kind == "image":
+                    renditions = await asyncio.to_thread(core.image_pipeline.prepare, Path(ref.path).read_bytes())
+                    media_hash = core.image_media_hash(renditions)
+                    run = lambda **kwargs: core.run_image(renditions, self.prompt, **kwargs)
+                    record = dict(media_hash=media_hash, kind="image", prompt=self.prompt,
+                                  thumbnail=make_thumbnail(renditions.preview))
+                else:
+                    media_hash = ref.sha256
+                    run = lambda **kwargs: core.run_video(ref.path, ref.sha256, self.prompt, **kwargs)
+                    record = dict(media_hash=media_hash, kind="video", prompt=self.prompt)
+
+                cache_key = core.cache_key(media_hash, self.prompt)
+                cached = core.response_cache.get(cache_key)
+                if cached is not None:
+                    self.write({"media_hash": media_hash, "answer": cached, "cached": True})
+                    return
+                if stream:
+                    await self.stream_answer(core, cache_key, run, record)
+                else:
+                    answer, shared = await asyncio.to_thread(core.run_once, cache_key, run, record)
+                    self.write({"media_hash": media_hash, "answer": answer, "cached": False, "coalesced": shared})
+        finally:
+            media_store.release_session(request_id)
+
+    async def stream_answer(self, core, cache_key, run, record):
+        # A request that joins an identical one already streaming gets the whole answer at once
+        self.set_header("Content-Type", "text/plain; charset=utf-8")
+        async for text in iterate_in_thread(lambda: core.stream_once(cache_key, run, record)):
+            self.write(text)
+            await self.flush()
+
+    def write_error(self, status_code, **kwargs):
+        self.set_header("Content-Type", "application/json")
+        self.finish(json.dumps({"error": self._reason}))
+
+
+def make_app(core, media_store=None, max_concurrency=16, max_waiting=64):
+    gate = ConcurrencyGate(max_concurrency, max_waiting)
+    REGISTRY.gauge(
+        "multimodal_api_requests", "Analysis requests in the API gate",
+        lambda: {"active": gate.active, "waiting": gate.waiting, "rejected": gate.rejected}, label="state",
+    )
+    REGISTRY.gauge("multimodal_governor", "Gemini call governor state", core.governor.stats, label="metric")
+    REGISTRY.gauge(
+        "multimodal_coalescing", "Model calls made and identical requests that shared one",
+        lambda: {"calls": core.flights.calls, "coalesced": core.flights.coalesced}, label="metric",
+    )
+    return tornado.web.Application(
+        [
+            (r"/healthz", HealthHandler),
+            (r"/metrics", MetricsHandler),
+            (r"/v1/images", AnalyzeHandler, {"kind": "image"}),
+            (r"/v1/videos", AnalyzeHandler, {"kind": "video"}),
+        ],
+        core=core,
+        media_store=media_store or MediaStore(),
+        gate=gate,
+    )
+
+
+async def serve(port, max_concurrency, max_waiting):
+    from analysis_core import AnalysisCore
+
+    media_store = MediaStore()
+    app = make_app(AnalysisCore.create(media_store=media_store), media_store, max_concurrency, max_waiting)
+    app.listen(port, max_body_size=MAX_BODY_BYTES)
+    await asyncio.Event().wait()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Multimodal agent HTTP API")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--max-concurrency", type=int, default=16, help="analyses running at once")
+    parser.add_argument("--max-waiting", type=int, default=64, help="requests allowed to queue for a slot")
+    args = parser.parse_args(argv)
+    asyncio.run(serve(args.port, args.max_concurrency, args.max_waiting))
+
+
+if __name__ == "__main__":
+    main()
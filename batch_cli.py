@@ -0,0 +1,132 @@
+"""Run the analysis pipeline over a JSONL manifest without the Streamlit UI.
+
+Each manifest line is {"id": ..., "media": "path/to/file", "prompt": "..."}.
+Results are appended to the output JSONL as they finish, and that file is
+the checkpoint: rerunning with the same output skips ids that already
+succeeded.
+
+    python batch_cli.py manifest.jsonl -o results.jsonl --concurrency 8 --rate 60
+"""
+import argparse
+import asyncio
+import json
+import sys
+import time
+from pathlib import Path
+
+
+class RateLimiter:
+    """Spaces out job starts to at most `per_minute` per minute."""
+
+    def __init__(self, per_minute):
+        self.interval = 60.0 / per_minute if per_minute else 0.0
+        self._next = 0.0
+        self._lock = asyncio.Lock()
+
+    async def wait(self):
+        if not self.interval:
+            return
+        async with self._lock:
+            now = time.monotonic()
+            delay = self._next - now
+            self._next = max(now, self._next) + self.interval
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+def read_manifest(path):
+    with open(path, encoding="utf-8") as f:
+        for line_number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            job = json.loads(line)
+            job.setdefault("id", str(line_number))
+            yield job
+
+
+def completed_ids(output_path):
+    done = set()
+    if not Path(output_path).exists():
+        return done
+    with open(output_path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                # A partial last line from an interrupted run
+                continue
+            if "error" not in record:
+                done.add(record["id"])
+    return done
+
+
+async def run_batch(core, jobs, output_path, concurrency=4, per_minute=0):
+    semaphore = asyncio.Semaphore(concurrency)
+    limiter = RateLimiter(per_minute)
+    write_lock = asyncio.Lock()
+    stats = {"ok": 0, "cached": 0, "failed": 0}
+
+    async def write(record):
+        async with write_lock:
+            with open(output_path, "a", encoding="utf-8") as out:
+                out.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+    async def run_one(job):
+        async with semaphore:
+            await limiter.wait()
+            try:
+                result = await asyncio.to_thread(core.analyze_file, job["media"], job["prompt"])
+            except Exception as e:
+                stats["failed"] += 1
+                await write({"id": job["id"], "media": job["media"], "error": f"{type(e).__name__}: {e}"})
+                return
+            stats["ok"] += 1
+            stats["cached"] += result.cached
+            await write({
+                "id": job["id"],
+                "media": job["media"],
+                "prompt": job["prompt"],
+                "media_hash": result.media_hash,
+                "answer": result.content,
+                "cached": result.cached,
+                "seconds": round(result.seconds, 3),
+            })
+
+    await asyncio.gather(*(run_one(job) for job in jobs))
+    return stats
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("manifest", help="JSONL file of {id, media, prompt} jobs")
+    parser.add_argument("-o", "--output", default="results.jsonl", help="JSONL results file, also the resume checkpoint")
+    parser.add_argument("-c", "--concurrency", type=int, default=4, help="jobs in flight at once")
+    parser.add_argument("--rate", type=float, default=0, help="max job starts per minute (0 = unlimited)")
+    args = parser.parse_args(argv)
+
+    from analysis_core import AnalysisCore
+
+    done = completed_ids(args.output)
+    jobs = [job for job in read_manifest(args.manifest) if job["id"] not in done]
+    print(f"{len(jobs)} jobs to run, {len(done)} already done", file=sys.stderr)
+    if not jobs:
+        return 0
+
+    core = AnalysisCore.create()
+    start = time.perf_counter()
+    stats = asyncio.run(run_batch(core, jobs, args.output, args.concurrency, args.rate))
+    elapsed = time.perf_counter() - start
+    if core.history is not None:
+        core.history.flush()
+    total = stats["ok"] + stats["failed"]
+    print(
+        f"{total} jobs in {elapsed:.1f}s: {total / elapsed * 60:.1f} jobs/min, "
+        f"{stats['cached']} cached, error rate {stats['failed'] / total:.1%}",
+        file=sys.stderr,
+    )
+    return 1 if stats["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
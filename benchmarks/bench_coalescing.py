@@ -0,0 +1,125 @@
+# Load test for cross-session coalescing: bursts of sessions ask the same question about the
+# same media at the same moment, through the JobQueue (app) and AnalysisCore.run_once (API/batch),
+# and the upstream model call count is compared with coalescing switched off.
+# Also checks that errors reach every subscriber and that a job survives its leader leaving.
+# Usage: python benchmarks/bench_coalescing.py [sessions_per_burst] [bursts] [distinct_questions]
+import random
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from analysis_core import AgentPool, AnalysisCore
+from fakes import FakeAgent, FaultModel, LatencyModel
+from governor import Governor
+from jobs import CANCELLED, DONE, FAILED, JobQueue
+from response_cache import make_key
+
+
+def wait_all(jobs, timeout=60):
+    deadline = time.monotonic() + timeout
+    while not all(job.finished for job in jobs) and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+
+def job_burst(sessions, bursts, questions, coalesce):
+    agent = FakeAgent(latency=LatencyModel(median=0.3, sigma=0.2))
+    queue = JobQueue(max_workers=64, max_queued=sessions * bursts, per_owner_limit=bursts)
+    rng = random.Random(0)
+    jobs = []
+    start = time.perf_counter()
+    for burst in range(bursts):
+        for session in range(sessions):
+            key = make_key("handout", f"question {rng.randrange(questions)} of burst {burst}", "fake", "")
+            run = lambda job, key=key: agent.run(key).content
+            jobs.append(queue.submit(f"session-{session}", "analysis", run, coalesce_key=key if coalesce else None))
+        wait_all(jobs)
+    elapsed = time.perf_counter() - start
+    answered = sum(job.status == DONE for job in jobs)
+    return agent.calls, answered, elapsed
+
+
+def run_once_burst(sessions, questions):
+    agent = FakeAgent(latency=LatencyModel(median=0.3, sigma=0.2))
+    core = AnalysisCore(AgentPool(lambda: agent), None, None, None, None, _NullCache(), Governor(requests_per_minute=0))
+    barrier = threading.Barrier(sessions)
+
+    def request(i):
+        key = f"handout:{i % questions}"
+        barrier.wait()
+        return core.run_once(key, lambda: agent.run(key))[1]
+
+    with ThreadPoolExecutor(max_workers=sessions) as pool:
+        shared = sum(pool.map(request, range(sessions)))
+    return agent.calls, shared
+
+
+class _NullCache:
+    def put(self, key, value):
+        pass
+
+
+def slow_failure(agent):
+    def run(job):
+        time.sleep(0.2)
+        return agent.run("q")
+    return run
+
+
+def waits_for_cancel(job):
+    for _ in range(100):
+        time.sleep(0.01)
+        job.check_cancelled()
+    return "finished"
+
+
+def check_error_propagation(sessions):
+    agent = FakeAgent(faults=FaultModel(error_rate=1.0))
+    queue = JobQueue(max_workers=4)
+    jobs = [queue.submit(f"session-{i}", "analysis", slow_failure(agent), coalesce_key="same")
+            for i in range(sessions)]
+    wait_all(jobs)
+    assert all(job.status == FAILED and job.error is jobs[0].error for job in jobs), "error not shared"
+    return agent.calls
+
+
+def check_leader_leaves():
+    agent = FakeAgent(latency=LatencyModel(median=0.3, sigma=0))
+    queue = JobQueue(max_workers=4)
+    leader = queue.submit("leader", "analysis", lambda job: agent.run("q").content, coalesce_key="same")
+    follower = queue.submit("follower", "analysis", lambda job: agent.run("q").content, coalesce_key="same")
+    queue.cancel_owner("leader")
+    wait_all([follower])
+    assert leader is follower and follower.status == DONE, "job was cancelled while a follower still needed it"
+
+    lonely = queue.submit("leader", "analysis", waits_for_cancel, coalesce_key="other")
+    queue.cancel_owner("leader")
+    wait_all([lonely])
+    assert lonely.status == CANCELLED, "job kept running after its only session left"
+
+
+def main():
+    sessions = int(sys.argv[1]) if len(sys.argv) > 1 else 40
+    bursts = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    questions = int(sys.argv[3]) if len(sys.argv) > 3 else 2
+
+    for coalesce in (False, True):
+        calls, answered, elapsed = job_burst(sessions, bursts, questions, coalesce)
+        label = "coalesced" if coalesce else "independent"
+        print(f"job queue, {label:<11}: {sessions * bursts} requests -> {calls} model calls, "
+              f"{answered} answered in {elapsed:.1f}s")
+
+    calls, shared = run_once_burst(sessions, questions)
+    print(f"run_once: {sessions} simultaneous requests -> {calls} model calls ({shared} shared)")
+
+    calls = check_error_propagation(sessions)
+    print(f"error propagation: {sessions} subscribers saw the same error from {calls} call(s)")
+    check_leader_leaves()
+    print("leader leaving: shared job kept running for its follower, unshared job was cancelled")
+
+
+if __name__ == "__main__":
+    main()
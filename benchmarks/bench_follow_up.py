@@ -0,0 +1,72 @@
+# Compares follow-up questions about one video asked statelessly (every question is a fresh
+# agent.run with the full video prompt, as the app did before conversation mode) against a
+# Conversation, printing latency and input tokens per turn. Needs GOOGLE_API_KEY; it calls the live API.
+# Usage: python benchmarks/bench_follow_up.py video.mp4 "first question" "follow-up" ["follow-up" ...]
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from analysis_core import AnalysisCore, build_agent
+from conversation import HISTORY_TURNS, Conversation, GeminiContextCache, usage_of
+from file_registry import sha256_file
+from search_cache import SearchCache
+from streaming import render_stream
+
+
+class NullPlaceholder:
+    def markdown(self, text):
+        pass
+
+
+def stateless(core, path, digest, questions):
+    rows = []
+    for question in questions:
+        start = time.perf_counter()
+        response = core.run_video(path, digest, question)
+        rows.append((time.perf_counter() - start, *usage_of(response)))
+    return rows
+
+
+def conversational(core, path, digest, questions):
+    conversation = Conversation(
+        core, path, digest,
+        lambda: build_agent(SearchCache(), core.model_id, history_turns=HISTORY_TURNS),
+        GeminiContextCache(core.model_id),
+    )
+    try:
+        for question in questions:
+            render_stream(conversation.ask(question), NullPlaceholder())
+    finally:
+        conversation.close()
+    if conversation.fallback_reason:
+        print(f"context cache unavailable: {conversation.fallback_reason}")
+    return [(turn.seconds, turn.input_tokens, turn.cached_tokens) for turn in conversation.turns], conversation.mode
+
+
+def main():
+    if len(sys.argv) < 4:
+        sys.exit("usage: bench_follow_up.py video.mp4 question follow-up [follow-up ...]")
+    path, questions = sys.argv[1], sys.argv[2:]
+    digest = sha256_file(path)
+    core = AnalysisCore.create(Path(tempfile.mkdtemp(prefix="bench-follow-up-")))
+
+    # Upload once up front so both runs reuse the same ACTIVE file and only generation is compared
+    core.upload_video(path, digest)
+    before = stateless(core, path, digest, questions)
+    after, mode = conversational(core, path, digest, questions)
+
+    print(f"{'turn':>4} | {'stateless s':>11} {'input tok':>10} | {mode + ' s':>11} {'input tok':>10} {'cached tok':>10}")
+    for i, ((old_s, old_tokens, _), (new_s, new_tokens, cached)) in enumerate(zip(before, after), 1):
+        print(f"{i:>4} | {old_s:>11.2f} {old_tokens or 0:>10} | {new_s:>11.2f} {new_tokens or 0:>10} {cached or 0:>10}")
+    follow_ups = slice(1, None)
+    old = sum(row[0] for row in before[follow_ups])
+    new = sum(row[0] for row in after[follow_ups])
+    if old:
+        print(f"follow-up latency: {old:.1f}s -> {new:.1f}s ({1 - new / old:.0%} less)")
+
+
+if __name__ == "__main__":
+    main()
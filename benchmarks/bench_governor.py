@@ -0,0 +1,89 @@
+# Drives the Governor against a fake backend that injects 429s above a fixed capacity
+# and random 5xx errors, then prints success rate, throttling and the limit it settled on.
+# Usage: python benchmarks/bench_governor.py [requests] [clients]
+import random
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from governor import AIMDLimiter, Governor
+
+
+class FakeAPIError(Exception):
+    def __init__(self, code):
+        super().__init__(f"HTTP {code}")
+        self.code = code
+
+
+class FaultInjectingServer:
+    """Accepts `capacity` concurrent calls, answers 429 beyond that and 5xx at `error_rate`."""
+
+    def __init__(self, capacity=6, latency=0.02, error_rate=0.02, slow_rate=0.02):
+        self.capacity = capacity
+        self.latency = latency
+        self.error_rate = error_rate
+        self.slow_rate = slow_rate
+        self.active = 0
+        self.calls = 0
+        self.rejected = 0
+        self._lock = threading.Lock()
+
+    def handle(self, payload):
+        with self._lock:
+            self.calls += 1
+            if self.active >= self.capacity:
+                self.rejected += 1
+                raise FakeAPIError(429)
+            self.active += 1
+        try:
+            if random.random() < self.error_rate:
+                raise FakeAPIError(503 if random.random() < 0.5 else 500)
+            # A small share of calls straggle, which is what hedging is for
+            time.sleep(self.latency * (20 if random.random() < self.slow_rate else 1))
+            return payload
+        finally:
+            with self._lock:
+                self.active -= 1
+
+
+def run(server, governor, requests, clients, idempotent):
+    failures = 0
+    latencies = []
+
+    def one(i):
+        start = time.perf_counter()
+        governor.call("fake", server.handle, i, idempotent=idempotent)
+        latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=clients) as pool:
+        for future in [pool.submit(one, i) for i in range(requests)]:
+            try:
+                future.result()
+            except Exception:
+                failures += 1
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    return elapsed, failures, latencies
+
+
+def main(requests=600, clients=32):
+    for idempotent in (False, True):
+        server = FaultInjectingServer()
+        governor = Governor(AIMDLimiter(initial=16), requests_per_minute=0, base_delay=0.01, max_delay=0.2)
+        elapsed, failures, latencies = run(server, governor, requests, clients, idempotent)
+        p50 = latencies[len(latencies) // 2] * 1000 if latencies else 0
+        p99 = latencies[int(len(latencies) * 0.99)] * 1000 if latencies else 0
+        print(
+            f"hedging={'on ' if idempotent else 'off'} ok={requests - failures}/{requests} "
+            f"upstream_calls={server.calls} 429s={server.rejected} "
+            f"p50={p50:.0f}ms p99={p99:.0f}ms {requests / elapsed:.0f} req/s {governor.stats()}"
+        )
+
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:3]])
@@ -0,0 +1,66 @@
+# Fills a HistoryStore with synthetic analyses and measures the cost of add() on the interactive
+# path, the background write throughput and full-text search latency.
+# Usage: python benchmarks/bench_history_search.py [records]
+import random
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from history_store import HistoryStore
+
+SUBJECTS = ["beam", "truss", "circuit", "molecule", "integral", "floor plan", "titration", "gear train",
+            "bridge", "reaction", "matrix", "column", "resistor", "enzyme", "derivative", "staircase"]
+WORDS = ("load stress moment shear deflection voltage current bond energy limit area volume ratio force "
+         "support span diagram equation solution result step value angle pressure flow rate").split()
+# Long-tailed vocabulary, like real answers: a few words everywhere, most rare
+VOCABULARY = WORDS + [f"term{i}" for i in range(5000)]
+WEIGHTS = [1 / (rank + 1) for rank in range(len(VOCABULARY))]
+QUERIES = ["beam diagram", "shear moment", "titration curve", "gear", "floor plan area",
+           "derivative limit", "enzyme reaction rate", "resistor voltage", "term42", "term4000 load", "diagrams showing loads"]
+
+
+def synthetic_record(rng, i):
+    subject = rng.choice(SUBJECTS)
+    prompt = f"Explain the {subject} in this diagram and compute the {rng.choice(WORDS)}"
+    answer = f"The {subject} shows " + " ".join(rng.choices(VOCABULARY, WEIGHTS, k=rng.randint(80, 250)))
+    return dict(media_hash=f"{i:064x}", kind=rng.choice(("image", "video")), prompt=prompt, answer=answer,
+                model_id="gemini-2.0-flash-exp", seconds=rng.uniform(2, 30), timings=[{"stage": "generate"}])
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    rng = random.Random(0)
+    store = HistoryStore(Path(tempfile.mkdtemp(prefix="bench-history-")) / "history.sqlite3",
+                         max_pending=count)
+
+    add_times = []
+    start = time.perf_counter()
+    for i in range(count):
+        record = synthetic_record(rng, i)
+        begin = time.perf_counter()
+        store.add(**record)
+        add_times.append(time.perf_counter() - begin)
+    store.flush(timeout=600)
+    elapsed = time.perf_counter() - start
+    add_times.sort()
+    print(f"{count} records written in {elapsed:.1f}s ({count / elapsed:,.0f}/s), dropped {store.dropped}")
+    print(f"add() on the caller: p50 {statistics.median(add_times) * 1e6:.1f} us, "
+          f"p99 {add_times[int(len(add_times) * 0.99)] * 1e6:.1f} us")
+
+    for query in QUERIES + [""]:
+        samples = []
+        for _ in range(20):
+            begin = time.perf_counter()
+            hits = store.search(query)
+            samples.append(time.perf_counter() - begin)
+        samples.sort()
+        print(f"search {query or '(recent)'!r:<24} {len(hits):3} hits  p50 {statistics.median(samples) * 1000:6.2f} ms"
+              f"  max {samples[-1] * 1000:6.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
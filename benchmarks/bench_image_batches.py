@@ -0,0 +1,88 @@
+# Compares one model call per image with batched multi-image calls on a fake backend whose
+# latency is a fixed per-call overhead plus a per-image cost, under a capped number of
+# concurrent calls and an optional requests-per-minute limit.
+# Usage: python benchmarks/bench_image_batches.py [images] [batch_size] [requests_per_minute]
+import json
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from types import SimpleNamespace
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from analysis_core import AgentPool, AnalysisCore
+from fakes import FakeAgent
+from governor import AIMDLimiter, Governor
+from image_batches import BatchPlanner, analyze_images
+from response_cache import ResponseCache
+
+CALL_OVERHEAD = 0.8
+PER_IMAGE = 0.15
+MAX_IN_FLIGHT = 4
+
+
+class FakeBatchAgent(FakeAgent):
+    """Answers batch prompts with the structured JSON that image_batches asks for."""
+
+    def run(self, prompt, images=None, videos=None, stream=False, **kwargs):
+        with self._lock:
+            self.calls += 1
+        count = len(images or [])
+        time.sleep(CALL_OVERHEAD + PER_IMAGE * count)
+        if count > 1:
+            answers = [{"image": i, "answer": f"answer for image {i}"} for i in range(1, count + 1)]
+            return SimpleNamespace(content=json.dumps({"answers": answers}))
+        return SimpleNamespace(content="answer for image")
+
+
+def make_renditions(count):
+    return [
+        (f"page-{i}.jpg", SimpleNamespace(sha256=f"image-{i}", preview=SimpleNamespace(size=(500, 300)),
+                                          model_jpeg=bytes(60_000), phash=None, dhash=None))
+        for i in range(count)
+    ]
+
+
+def make_core(requests_per_minute):
+    limiter = AIMDLimiter(initial=MAX_IN_FLIGHT, maximum=MAX_IN_FLIGHT)
+    governor = Governor(limiter, requests_per_minute=requests_per_minute)
+    cache = ResponseCache(Path(tempfile.mkdtemp(prefix="bench-batches-")) / "responses.sqlite3")
+    agent = FakeBatchAgent()
+    return AnalysisCore(AgentPool(lambda: agent), None, None, None, None, cache, governor), agent
+
+
+def one_call_per_image(images, requests_per_minute):
+    core, agent = make_core(requests_per_minute)
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=MAX_IN_FLIGHT) as pool:
+        list(pool.map(lambda item: core.run_image(item[1], "Describe this page"), images))
+    return time.perf_counter() - start, agent.calls
+
+
+def batched(images, batch_size, requests_per_minute):
+    core, agent = make_core(requests_per_minute)
+    start = time.perf_counter()
+    answers = list(analyze_images(core, images, "Describe this page", BatchPlanner(max_images=batch_size),
+                                  max_parallel=MAX_IN_FLIGHT))
+    assert len(answers) == len(images)
+    return time.perf_counter() - start, agent.calls
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 32
+    batch_size = int(sys.argv[2]) if len(sys.argv) > 2 else 8
+    requests_per_minute = float(sys.argv[3]) if len(sys.argv) > 3 else 0
+    images = make_renditions(count)
+
+    single_seconds, single_calls = one_call_per_image(images, requests_per_minute)
+    batch_seconds, batch_calls = batched(images, batch_size, requests_per_minute)
+    print(f"{count} images, at most {MAX_IN_FLIGHT} calls in flight, "
+          f"{requests_per_minute or 'unlimited'} requests/minute")
+    print(f"  one call per image: {single_calls:3} calls {single_seconds:6.1f}s {count / single_seconds:6.1f} images/s")
+    print(f"  batches of {batch_size:<8}: {batch_calls:3} calls {batch_seconds:6.1f}s {count / batch_seconds:6.1f} images/s")
+
+
+if __name__ == "__main__":
+    main()
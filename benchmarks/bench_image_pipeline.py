@@ -0,0 +1,53 @@
+# Compares the original resize/convert/temp-file path with ImagePipeline on a large JPEG.
+# Usage: python benchmarks/bench_image_pipeline.py [megapixels] [repeats]
+import io
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from PIL import Image
+
+from image_pipeline import ImagePipeline
+
+
+def make_jpeg(megapixels):
+    width = int((megapixels * 1e6 * 4 / 3) ** 0.5)
+    height = int(width * 3 / 4)
+    image = Image.linear_gradient("L").resize((width, height)).convert("RGB")
+    buffer = io.BytesIO()
+    image.save(buffer, format="JPEG", quality=90)
+    return buffer.getvalue()
+
+
+def original_path(data):
+    image = Image.open(io.BytesIO(data))
+    image.thumbnail((500, 300))
+    image = image.convert("RGB")
+    temp_image_path = tempfile.mktemp(suffix='.jpg')
+    image.save(temp_image_path)
+    os.unlink(temp_image_path)
+
+
+def timed(fn, repeats):
+    start = time.perf_counter()
+    for _ in range(repeats):
+        fn()
+    return (time.perf_counter() - start) / repeats * 1000
+
+
+def main(megapixels=24, repeats=5):
+    data = make_jpeg(megapixels)
+    print(f"{megapixels} MP JPEG, {len(data) / 2**20:.1f} MiB")
+    print(f"original path:        {timed(lambda: original_path(data), repeats):8.1f} ms")
+    print(f"draft decode (cold):  {timed(lambda: ImagePipeline().prepare(data), repeats):8.1f} ms")
+    pipeline = ImagePipeline()
+    pipeline.prepare(data)
+    print(f"memoized rerun:       {timed(lambda: pipeline.prepare(data), repeats):8.3f} ms")
+
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:3]])
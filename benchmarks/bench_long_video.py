@@ -0,0 +1,81 @@
+# End-to-end long-video mode against stub models: renders a synthetic recording with ffmpeg,
+# splits it with split_video, uploads segments through a fake File API and runs
+# MapReduceAnalyzer.run with FakeAgent for both the per-segment and the merge calls.
+# Checks that segments tile the whole recording and that every segment reaches the merge
+# prompt, and compares the parallel map phase with analyzing the segments one by one.
+# Usage: python benchmarks/bench_long_video.py [minutes] [segment_minutes] [max_parallel]
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import imageio_ffmpeg
+
+from fakes import FakeAgent, LatencyModel, SlowFileBackend
+from file_registry import FileRegistry
+from long_video import MapReduceAnalyzer, format_timestamp, reduce_prompt, segment_prompt, split_video
+
+
+def make_recording(path, minutes):
+    # Low resolution and frame rate keep the render to a few seconds even for an hour of video
+    subprocess.run(
+        [imageio_ffmpeg.get_ffmpeg_exe(), "-y", "-loglevel", "error",
+         "-f", "lavfi", "-i", f"testsrc=size=320x180:rate=5:duration={minutes * 60}",
+         "-c:v", "libx264", "-preset", "ultrafast", "-g", "50", str(path)],
+        check=True, capture_output=True,
+    )
+
+
+def analyzer(registry, agent, max_parallel, prompts):
+    def upload(segment):
+        return registry.get_or_upload(segment.path)
+
+    def analyze(handle, segment, question):
+        return agent.run(segment_prompt(segment, question), videos=[handle]).content
+
+    def reduce(question, findings):
+        prompt = reduce_prompt(question, findings)
+        prompts.append(prompt)
+        return agent.run(prompt).content
+
+    return MapReduceAnalyzer(upload, analyze, reduce, max_parallel=max_parallel)
+
+
+def main(minutes, segment_minutes, max_parallel):
+    work_dir = Path(tempfile.mkdtemp(prefix="bench-long-video-"))
+    source = work_dir / "recording.mp4"
+    start = time.perf_counter()
+    make_recording(source, minutes)
+    print(f"rendered a {minutes} min recording in {time.perf_counter() - start:.1f}s")
+
+    start = time.perf_counter()
+    segments = split_video(source, work_dir / "segments", "recording", segment_minutes * 60)
+    print(f"split into {len(segments)} segments in {time.perf_counter() - start:.1f}s")
+    assert segments[0].start == 0 and abs(segments[-1].end - minutes * 60) < 1, "segments must cover the recording"
+    assert all(a.end == b.start for a, b in zip(segments, segments[1:])), "segments must not overlap or leave gaps"
+
+    question = "What changes over the course of the recording?"
+    for parallel in (1, max_parallel):
+        agent = FakeAgent(latency=LatencyModel(median=1.0, sigma=0.3))
+        backend = SlowFileBackend(processing_polls=0, upload_latency=LatencyModel(median=0.3, sigma=0.3))
+        prompts = []
+        result = analyzer(FileRegistry(backend), agent, parallel, prompts).run(segments, question)
+        assert [f.segment.index for f in result.findings] == list(range(len(segments))), "findings out of order"
+        assert all(format_timestamp(s.start) in prompts[0] for s in segments), "a segment is missing from the merge"
+        print(f"  max_parallel={parallel}: map {result.map_seconds:.1f}s, reduce {result.reduce_seconds:.1f}s, "
+              f"{backend.uploads} uploads, {agent.calls} model calls, answer {len(result.answer)} chars")
+
+    try:
+        MapReduceAnalyzer(None, None, None).run([], question)
+    except ValueError as e:
+        print(f"  no segments: {e}")
+
+
+if __name__ == "__main__":
+    minutes = int(sys.argv[1]) if len(sys.argv) > 1 else 60
+    segment_minutes = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+    max_parallel = int(sys.argv[3]) if len(sys.argv) > 3 else 4
+    main(minutes, segment_minutes, max_parallel)
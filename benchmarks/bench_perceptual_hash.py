@@ -0,0 +1,126 @@
+# Precision/recall of near-duplicate matching on a synthetic corpus of diagram-like images and
+# their re-saved, screenshotted, cropped and brightened copies, plus multi-index lookup latency
+# against a linear scan as the index grows.
+# Usage: python benchmarks/bench_perceptual_hash.py [base_images] [index_size]
+import io
+import random
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from PIL import Image, ImageDraw, ImageEnhance
+
+from image_pipeline import resize_image
+from hash_index import PHASH_THRESHOLD, MultiIndex, NearDuplicateIndex, hamming
+from perceptual_hash import image_hashes
+
+
+def make_diagram(rng, size=(1200, 900)):
+    image = Image.new("RGB", size, "white")
+    draw = ImageDraw.Draw(image)
+    for _ in range(rng.randint(6, 14)):
+        x, y = rng.randrange(size[0] - 200), rng.randrange(size[1] - 150)
+        box = (x, y, x + rng.randint(60, 300), y + rng.randint(40, 200))
+        color = tuple(rng.randrange(200) for _ in range(3))
+        shape = rng.choice(("rectangle", "ellipse", "line"))
+        if shape == "rectangle":
+            draw.rectangle(box, outline=color, width=4, fill=rng.choice((None, color)))
+        elif shape == "ellipse":
+            draw.ellipse(box, outline=color, width=4)
+        else:
+            draw.line(box, fill=color, width=6)
+        draw.text((x + 8, y + 8), f"label {rng.randrange(1000)}", fill=color)
+    return image
+
+
+def encode(image, fmt="JPEG", **kwargs):
+    buffer = io.BytesIO()
+    image.save(buffer, format=fmt, **kwargs)
+    return buffer.getvalue()
+
+
+def variants(image):
+    width, height = image.size
+    dx, dy = int(width * 0.04), int(height * 0.04)
+    return {
+        "resaved_jpeg": encode(image, quality=55),
+        "screenshot_png": encode(image.resize((int(width * 0.8), int(height * 0.8))), "PNG"),
+        "cropped": encode(image.crop((dx, dy, width - dx, height - dy)), quality=85),
+        "brighter": encode(ImageEnhance.Brightness(image).enhance(1.15), quality=85),
+    }
+
+
+def hashes(data):
+    return image_hashes(resize_image(io.BytesIO(data)).convert("RGB"))
+
+
+def accuracy(base_count, seed=0):
+    rng = random.Random(seed)
+    index = NearDuplicateIndex()
+    originals = [make_diagram(rng) for _ in range(base_count)]
+    for i, image in enumerate(originals):
+        index.canonical(f"base-{i}", *hashes(encode(image, quality=90)))
+
+    per_kind = {}
+    false_matches = 0
+    for i, image in enumerate(originals):
+        for kind, data in variants(image).items():
+            match = index.find(*hashes(data))
+            hit, total = per_kind.get(kind, (0, 0))
+            per_kind[kind] = (hit + (match == f"base-{i}"), total + 1)
+            false_matches += match is not None and match != f"base-{i}"
+    # Unrelated images must not match anything
+    for _ in range(base_count):
+        false_matches += index.find(*hashes(encode(make_diagram(rng), quality=90))) is not None
+
+    true_matches = sum(hit for hit, _ in per_kind.values())
+    positives = sum(total for _, total in per_kind.values())
+    print(f"corpus: {base_count} originals, {positives} near-duplicate copies, {base_count} unrelated images")
+    for kind, (hit, total) in per_kind.items():
+        print(f"  recall {kind:<15} {hit / total:6.1%}")
+    precision = true_matches / (true_matches + false_matches) if true_matches + false_matches else 1.0
+    print(f"  precision {precision:.1%}  recall {true_matches / positives:.1%}  false matches {false_matches}")
+
+
+def lookup_latency(index_size, queries=1000, seed=1):
+    rng = random.Random(seed)
+    keys = [rng.getrandbits(64) for _ in range(index_size)]
+    index = MultiIndex(PHASH_THRESHOLD)
+    for i, key in enumerate(keys):
+        index.add(key, i)
+    # Half the queries are near copies of stored hashes, half are unrelated
+    probes = []
+    for _ in range(queries // 2):
+        key = rng.choice(keys)
+        for bit in rng.sample(range(64), 4):
+            key ^= 1 << bit
+        probes.append(key)
+    probes += [rng.getrandbits(64) for _ in range(queries - len(probes))]
+
+    def timed(fn):
+        samples = []
+        for probe in probes:
+            start = time.perf_counter()
+            fn(probe)
+            samples.append((time.perf_counter() - start) * 1e6)
+        samples.sort()
+        return statistics.median(samples), samples[int(len(samples) * 0.99)]
+
+    for probe in probes[:50]:
+        expected = sorted(i for i, k in enumerate(keys) if hamming(k, probe) <= PHASH_THRESHOLD)
+        assert sorted(value for _, value in index.search(probe)) == expected, "index missed a match"
+    index_p50, index_p99 = timed(lambda probe: index.search(probe))
+    scan_p50, scan_p99 = timed(lambda probe: [k for k in keys if hamming(k, probe) <= PHASH_THRESHOLD])
+    print(f"lookup over {index_size} hashes: multi-index p50 {index_p50:.0f} us p99 {index_p99:.0f} us, "
+          f"linear scan p50 {scan_p50:.0f} us p99 {scan_p99:.0f} us")
+
+
+if __name__ == "__main__":
+    base_count = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    index_size = int(sys.argv[2]) if len(sys.argv) > 2 else 100_000
+    accuracy(base_count)
+    for size in (1_000, 10_000, index_size):
+        lookup_latency(size)
@@ -0,0 +1,129 @@
+# Server memory with many open tabs: sessions hold uploads in a stand-in for Streamlit's in-memory
+# upload manager plus decoded previews, most of them go idle, and the memory governor spills them.
+# Reports resident memory before and after, the cost of one enforce pass, read-back speed of
+# a spilled (memory-mapped) upload against the in-memory bytes, and what reruns of spilled tabs
+# that come back cost before and after the governor loads their uploads back.
+# Usage: python benchmarks/bench_session_memory.py [sessions] [upload_mb] [active_fraction]
+import hashlib
+import io
+import os
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections import defaultdict, namedtuple
+from pathlib import Path
+from types import SimpleNamespace
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from media_store import MediaStore
+from memory_governor import SessionMemoryGovernor, StreamlitUploads
+
+# Same shape as Streamlit's UploadedFileRec
+UploadedFileRec = namedtuple("UploadedFileRec", "file_id name type data")
+PREVIEW_BYTES = 500 * 300 * 3
+
+
+class FakeRenditions:
+    # Only what the governor touches: the preview's size and dropping it
+    def __init__(self):
+        self.preview = bytearray(PREVIEW_BYTES)
+
+    @property
+    def preview_bytes(self):
+        return len(self.preview) if self.preview is not None else 0
+
+    def drop_preview(self):
+        released = self.preview_bytes
+        self.preview = None
+        return released
+
+
+def rss_mb():
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+
+
+def read_back_ms(data, repeats=20):
+    samples = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        # Hashing reads every byte, as preparing an image or spooling a video does
+        hashlib.sha256(data).digest()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+def rerun(manager, governor, session_ids, live):
+    # Streamlit wraps the stored upload in a new UploadedFile (a BytesIO) on every run, and the
+    # widget keeps the latest one alive until the next run
+    for session_id in session_ids:
+        live[session_id] = [io.BytesIO(rec.data) for rec in manager.file_storage[session_id].values()]
+        governor.touch(session_id, files=live[session_id])
+
+
+def allocated_mb(fn):
+    # Python heap one call allocates; RSS would also show pages the allocator keeps after a free
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak / 2**20
+
+
+def main(sessions, upload_mb, active_fraction):
+    manager = SimpleNamespace(file_storage=defaultdict(dict))
+    now = [0.0]
+    governor = SessionMemoryGovernor(
+        MediaStore(tempfile.mkdtemp(prefix="bench-session-memory-")), StreamlitUploads(manager),
+        ceiling_bytes=sessions * upload_mb * 2**20 // 4, clock=lambda: now[0],
+    )
+    baseline = rss_mb()
+    for i in range(sessions):
+        session_id = f"session-{i}"
+        # Every tab uploads different bytes, as real ones do
+        data = os.urandom(64) * (upload_mb * 2**20 // 64)
+        manager.file_storage[session_id][f"file-{i}"] = UploadedFileRec(f"file-{i}", f"upload-{i}.jpg", "image/jpeg", data)
+        governor.touch(session_id, derived=[FakeRenditions()])
+    loaded = rss_mb()
+    held = sum(governor.usage().values())
+
+    # Most tabs go quiet; the rest keep rerunning
+    now[0] += governor.idle_seconds + 1
+    for i in range(int(sessions * active_fraction)):
+        governor.touch(f"session-{i}")
+    start = time.perf_counter()
+    freed = governor.enforce()
+    enforce_s = time.perf_counter() - start
+    spilled = rss_mb()
+
+    in_memory = os.urandom(64) * (upload_mb * 2**20 // 64)
+    mapped = manager.file_storage[f"session-{sessions - 1}"][f"file-{sessions - 1}"].data
+
+    print(f"{sessions} sessions x {upload_mb} MiB upload + preview, {active_fraction:.0%} active")
+    print(f"  governor view: {held / 2**20:.0f} MiB held, {freed / 2**20:.0f} MiB spilled or dropped "
+          f"in {enforce_s:.2f}s ({governor.spills} spills)")
+    print(f"  RSS: {baseline:.0f} MiB empty, {loaded:.0f} MiB loaded, {spilled:.0f} MiB after enforce")
+    print(f"  read back {upload_mb} MiB: in memory {read_back_ms(in_memory):.2f} ms, "
+          f"memory-mapped {read_back_ms(mapped):.2f} ms")
+
+    # The same number of spilled tabs come back and keep rerunning
+    back = [f"session-{i}" for i in range(sessions - int(sessions * active_fraction), sessions)]
+    live = {}
+    mapped_rerun = allocated_mb(lambda: rerun(manager, governor, back, live))
+    seen = sum(governor.usage()[sid] for sid in back)
+    governor.enforce()
+    restored_rerun = allocated_mb(lambda: rerun(manager, governor, back, live))
+    print(f"  {len(back)} spilled tabs rerun: {mapped_rerun:.0f} MiB copied per rerun while mapped "
+          f"({seen / 2**20:.0f} MiB counted by the governor), {restored_rerun:.0f} MiB per rerun once loaded back "
+          f"({governor.restores} restores)")
+    print(f"  stats: {governor.stats()}")
+
+
+if __name__ == "__main__":
+    sessions = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    upload_mb = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+    active_fraction = float(sys.argv[3]) if len(sys.argv) > 3 else 0.1
+    main(sessions, upload_mb, active_fraction)
@@ -0,0 +1,55 @@
+# Compares peak Python memory of spool_upload against the old read()-then-write copy.
+# Usage: python benchmarks/bench_spool_memory.py [size_mb ...]
+import os
+import sys
+import tempfile
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from media_io import spool_upload
+
+
+def make_source(size_mb):
+    with tempfile.NamedTemporaryFile(delete=False, suffix=".bin") as f:
+        block = os.urandom(1024 * 1024)
+        for _ in range(size_mb):
+            f.write(block)
+        return f.name
+
+
+def read_all_copy(source):
+    with tempfile.NamedTemporaryFile(delete=False, suffix=".mp4") as tmp_file:
+        tmp_file.write(source.read())
+        return tmp_file.name
+
+
+def spooled_copy(source):
+    return spool_upload(source, suffix=".mp4").path
+
+
+def peak_bytes(copy, source_path):
+    with open(source_path, "rb") as source:
+        tracemalloc.start()
+        out = copy(source)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    os.unlink(out)
+    return peak
+
+
+def main(sizes):
+    print(f"{'size_mb':>8} {'read()_peak_mb':>15} {'spool_peak_mb':>14}")
+    for size_mb in sizes:
+        source_path = make_source(size_mb)
+        try:
+            naive = peak_bytes(read_all_copy, source_path)
+            spooled = peak_bytes(spooled_copy, source_path)
+        finally:
+            os.unlink(source_path)
+        print(f"{size_mb:>8} {naive / 2**20:>15.1f} {spooled / 2**20:>14.1f}")
+
+
+if __name__ == "__main__":
+    main([int(arg) for arg in sys.argv[1:]] or [16, 64, 256])
@@ -0,0 +1,86 @@
+# Import-time profile of the app's cold start: everything multimodel_agent.py imports at
+# module level runs before the first widget can paint, so it is measured with
+# `python -X importtime` in a fresh interpreter and checked against a budget.
+#
+# Usage: python benchmarks/profile_imports.py [--runs 5] [--top 15] [--budget-ms 1000]
+import argparse
+import ast
+import statistics
+import subprocess
+import sys
+from collections import defaultdict
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+APP = ROOT / "multimodel_agent.py"
+
+# Must never load before first paint; each is imported on the branch that needs it
+DEFERRED = ("phi", "google.generativeai", "duckduckgo_search", "PIL", "numpy", "imageio_ffmpeg")
+
+
+def startup_imports(path=APP):
+    # Only module-level statements run on a cold start; imports inside functions are deferred
+    statements = []
+    for node in ast.parse(path.read_text()).body:
+        if isinstance(node, (ast.Import, ast.ImportFrom)):
+            statements.append(ast.unparse(node))
+    return statements
+
+
+def profile_once(statements):
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "\n".join(statements)],
+        cwd=ROOT, capture_output=True, text=True,
+    )
+    if result.returncode != 0:
+        sys.exit(result.stderr.strip().splitlines()[-1])
+    # Lines look like "import time:  self [us] | cumulative | <indent>package"
+    modules = {}
+    top_level = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        module = name.strip()
+        modules[module] = int(cumulative) / 1000
+        if len(name) - len(name.lstrip()) == 1:
+            top_level[module.split(".")[0]] = top_level.get(module.split(".")[0], 0) + int(cumulative) / 1000
+    return modules, top_level
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Profile the app's import time before first paint")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--budget-ms", type=float, default=1000, help="import budget before first paint")
+    args = parser.parse_args(argv)
+
+    statements = startup_imports()
+    totals = []
+    per_package = defaultdict(list)
+    for _ in range(args.runs):
+        modules, top_level = profile_once(statements)
+        totals.append(sum(top_level.values()))
+        for package, ms in top_level.items():
+            per_package[package].append(ms)
+
+    print(f"Startup imports of {APP.name} (median of {args.runs} runs):")
+    ranked = sorted(per_package.items(), key=lambda item: statistics.median(item[1]), reverse=True)
+    for package, samples in ranked[:args.top]:
+        print(f"  {statistics.median(samples):8.1f} ms  {package}")
+    total = statistics.median(totals)
+    print(f"  {total:8.1f} ms  total (budget {args.budget_ms:.0f} ms)")
+
+    failures = []
+    loaded = [name for name in DEFERRED if name in modules]
+    if loaded:
+        failures.append(f"loaded before first paint: {', '.join(loaded)}")
+    if total > args.budget_ms:
+        failures.append(f"import time {total:.0f} ms is over the {args.budget_ms:.0f} ms budget")
+    for failure in failures:
+        print(f"FAIL {failure}", file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,229 @@
+# Offline benchmark suite: drives the image and video paths through AnalysisCore with
+# deterministic fakes for Gemini, the File API and DuckDuckGo, including simulated
+# Streamlit reruns, and compares the results against stored baselines.
+#
+# Usage:
+#   python benchmarks/run_suite.py                      # run and compare with baselines.json
+#   python benchmarks/run_suite.py --update-baseline    # run and store the results as the new baseline
+#   python benchmarks/run_suite.py --sessions 200 --scenario image
+import argparse
+import io
+import json
+import random
+import resource
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from PIL import Image
+
+from analysis_core import AgentPool, AnalysisCore
+from fakes import FakeAgent, FaultModel, LatencyModel, PassthroughTranscoder, SlowFileBackend, SlowSearchBackend
+from file_poller import FilePoller
+from file_registry import FileRegistry
+from governor import GovernedFileBackend, Governor
+from image_pipeline import ImagePipeline
+from media_store import MediaStore
+from response_cache import ResponseCache
+from search_cache import SearchCache
+from streaming import render_stream
+
+BASELINE_PATH = Path(__file__).with_name("baselines.json")
+# A run regresses when it is this much worse than the baseline
+TOLERANCE = 0.25
+
+
+class NullPlaceholder:
+    def markdown(self, text):
+        pass
+
+
+def percentile(values, q):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(int(q * len(ordered)), len(ordered) - 1)]
+
+
+def peak_rss_mb():
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 2**20 if sys.platform == "darwin" else peak / 1024
+
+
+def make_core(work_dir, args):
+    search_backend = SlowSearchBackend(LatencyModel(median=args.search_latency, seed=2))
+    search_cache = SearchCache()
+    search = lambda query: search_cache.lookup("text", query, 5, lambda: search_backend.search(query))
+    faults = FaultModel(error_rate=args.error_rate, seed=3)
+    agent = FakeAgent(
+        latency=LatencyModel(median=args.model_latency, seed=4),
+        first_token=LatencyModel(median=args.model_latency / 3, seed=5),
+        faults=faults,
+        search=search,
+    )
+    governor = Governor(requests_per_minute=0, base_delay=0.05, max_delay=0.5)
+    file_backend = SlowFileBackend(
+        upload_latency=LatencyModel(median=args.upload_latency, seed=6),
+        faults=FaultModel(error_rate=args.error_rate, seed=7),
+    )
+    file_registry = FileRegistry(GovernedFileBackend(file_backend, governor))
+    core = AnalysisCore(
+        agents=AgentPool(lambda: agent),
+        file_registry=file_registry,
+        file_poller=FilePoller(file_registry.backend.get, min_interval=0.02, max_interval=0.2),
+        transcoder=PassthroughTranscoder(),
+        image_pipeline=ImagePipeline(),
+        response_cache=ResponseCache(work_dir / "responses.sqlite3"),
+        governor=governor,
+    )
+    return core, agent, file_backend, search_backend
+
+
+def make_images(count, megapixels, seed=0):
+    rng = random.Random(seed)
+    width = int((megapixels * 1e6 * 4 / 3) ** 0.5)
+    height = int(width * 3 / 4)
+    images = []
+    for i in range(count):
+        image = Image.new("RGB", (width, height), tuple(rng.randrange(256) for _ in range(3)))
+        buffer = io.BytesIO()
+        image.save(buffer, format="JPEG", quality=90)
+        images.append(buffer.getvalue())
+    return images
+
+
+def make_videos(count, megabytes, seed=0):
+    rng = random.Random(seed)
+    return [rng.randbytes(int(megabytes * 2**20)) for _ in range(count)]
+
+
+def run_scenario(kind, args):
+    work_dir = Path(tempfile.mkdtemp(prefix=f"bench-{kind}-"))
+    core, agent, file_backend, search_backend = make_core(work_dir, args)
+    media_store = MediaStore(work_dir / "media")
+    rng = random.Random(42)
+    if kind == "image":
+        media = make_images(args.distinct_media, args.image_megapixels)
+    else:
+        media = make_videos(args.distinct_media, args.video_megabytes)
+    questions = [f"What is shown here? (variant {i})" for i in range(args.distinct_questions)]
+    # Assign media and questions up front so the workload doesn't depend on thread scheduling
+    plan = [(rng.randrange(len(media)), rng.randrange(len(questions))) for _ in range(args.sessions)]
+    latencies = []
+    errors = 0
+    lock = threading.Lock()
+
+    def session(index):
+        nonlocal errors
+        data = media[plan[index][0]]
+        question = questions[plan[index][1]]
+        session_id = f"session-{index}"
+        try:
+            # Every widget interaction reruns the script; only the last rerun clicks the button
+            for _ in range(max(args.reruns, 1)):
+                ref = media_store.acquire(session_id, kind, f"upload-{index}", io.BytesIO(data), suffix=".bin")
+                if kind == "image":
+                    renditions = core.image_pipeline.prepare(data)
+            start = time.perf_counter()
+            if kind == "image":
+                media_hash = renditions.sha256
+                run = lambda **kwargs: core.run_image(renditions, question, **kwargs)
+            else:
+                media_hash = ref.sha256
+                run = lambda **kwargs: core.run_video(ref.path, ref.sha256, question, **kwargs)
+            key = core.cache_key(media_hash, question)
+            if core.response_cache.get(key) is None:
+                if index % 2:
+                    content = render_stream(run(stream=True), NullPlaceholder()).content
+                else:
+                    content = run().content
+                core.response_cache.put(key, content)
+            with lock:
+                latencies.append(time.perf_counter() - start)
+        except Exception:
+            with lock:
+                errors += 1
+        finally:
+            media_store.release_session(session_id)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        list(pool.map(session, range(args.sessions)))
+    elapsed = time.perf_counter() - start
+
+    return {
+        "sessions": args.sessions,
+        "throughput_per_s": round(args.sessions / elapsed, 2),
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 1),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 1),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 1),
+        "errors": errors,
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+        "disk_bytes_written": media_store.stats()["bytes_written"],
+        "model_calls": agent.calls,
+        "uploads": file_backend.uploads,
+        "searches": search_backend.calls,
+    }
+
+
+def compare(name, result, baseline):
+    # Lower is better for latency, memory and disk; higher is better for throughput
+    problems = []
+    for metric in ("p50_ms", "p95_ms", "p99_ms", "peak_rss_mb", "disk_bytes_written", "model_calls", "uploads"):
+        if metric in baseline and result[metric] > baseline[metric] * (1 + TOLERANCE) + 1:
+            problems.append(f"{name}.{metric}: {result[metric]} vs baseline {baseline[metric]}")
+    if "throughput_per_s" in baseline and result["throughput_per_s"] < baseline["throughput_per_s"] * (1 - TOLERANCE):
+        problems.append(
+            f"{name}.throughput_per_s: {result['throughput_per_s']} vs baseline {baseline['throughput_per_s']}"
+        )
+    return problems
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Offline benchmark suite with fake backends")
+    parser.add_argument("--scenario", choices=("image", "video", "all"), default="all")
+    parser.add_argument("--sessions", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--reruns", type=int, default=5, help="script reruns per session before the click")
+    parser.add_argument("--distinct-media", type=int, default=10)
+    parser.add_argument("--distinct-questions", type=int, default=5)
+    parser.add_argument("--image-megapixels", type=float, default=12)
+    parser.add_argument("--video-megabytes", type=float, default=8)
+    parser.add_argument("--model-latency", type=float, default=0.5)
+    parser.add_argument("--upload-latency", type=float, default=0.2)
+    parser.add_argument("--search-latency", type=float, default=0.3)
+    parser.add_argument("--error-rate", type=float, default=0.02)
+    parser.add_argument("--update-baseline", action="store_true")
+    args = parser.parse_args(argv)
+
+    scenarios = ("image", "video") if args.scenario == "all" else (args.scenario,)
+    results = {name: run_scenario(name, args) for name in scenarios}
+    print(json.dumps(results, indent=2))
+
+    if args.update_baseline:
+        baselines = json.loads(BASELINE_PATH.read_text()) if BASELINE_PATH.exists() else {}
+        baselines.update(results)
+        BASELINE_PATH.write_text(json.dumps(baselines, indent=2) + "\n")
+        print(f"Baseline written to {BASELINE_PATH}", file=sys.stderr)
+        return 0
+    if not BASELINE_PATH.exists():
+        print("No baseline stored yet; run with --update-baseline", file=sys.stderr)
+        return 0
+    baselines = json.loads(BASELINE_PATH.read_text())
+    problems = []
+    for name, result in results.items():
+        if name in baselines:
+            problems.extend(compare(name, result, baselines[name]))
+    for problem in problems:
+        print(f"REGRESSION {problem}", file=sys.stderr)
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,190 @@
+import hashlib
+import threading
+import time
+from dataclasses import dataclass
+from datetime import timedelta
+
+from analysis_core import MODEL_ID, video_prompt
+from metrics import record
+
+CONTEXT_CACHE_TTL = 60 * 60
+HISTORY_TURNS = 10
+SYSTEM_INSTRUCTION = (
+    "You are a multimodal analyst. Answer questions about the attached video, "
+    "focusing on practical, actionable information."
+)
+
+
+@dataclass
+class Turn:
+    question: str
+    answer: str
+    seconds: float
+    mode: str
+    input_tokens: int = None
+    cached_tokens: int = None
+
+    def summary(self):
+        if self.mode == "cache":
+            return "Answered from cache"
+        text = f"{self.seconds:.1f}s"
+        if self.input_tokens is not None:
+            text += f" · {self.input_tokens:,} input tokens"
+            if self.cached_tokens:
+                text += f" ({self.cached_tokens:,} from the context cache)"
+        return text
+
+
+def recap_prompt(turns, prompt):
+    # Turns answered from the response cache never reached the model; replay them before the next question
+    earlier = "\n\n".join(f"Q: {turn.question}\nA: {turn.answer}" for turn in turns)
+    return f"""
+    Earlier in this conversation these questions about the video were already answered:
+
+    {earlier}
+
+    {prompt}
+    """
+
+
+def usage_of(response):
+    # (input tokens, cached tokens) from a google.generativeai response or a phi RunResponse
+    usage = getattr(response, "usage_metadata", None)
+    if usage is not None:
+        return usage.prompt_token_count, getattr(usage, "cached_content_token_count", 0) or 0
+    metrics = getattr(response, "metrics", None) or {}
+    tokens = metrics.get("input_tokens")
+    if tokens is None:
+        return None, None
+    return (sum(tokens) if isinstance(tokens, list) else tokens), None
+
+
+class GeminiContextCache:
+    """Explicit context caching of a video through google.generativeai.
+
+    Gemini only caches prefixes on models that support it and above a
+    minimum token count, so create() raising is expected for short clips.
+    """
+
+    def __init__(self, model_id=MODEL_ID, ttl=CONTEXT_CACHE_TTL):
+        self.model_id = model_id
+        self.ttl = ttl
+
+    def create(self, video_file):
+        import google.generativeai as genai
+        from google.generativeai import caching
+
+        cache = caching.CachedContent.create(
+            model=f"models/{self.model_id}",
+            system_instruction=SYSTEM_INSTRUCTION,
+            contents=[video_file],
+            ttl=timedelta(seconds=self.ttl),
+        )
+        return cache, genai.GenerativeModel.from_cached_content(cached_content=cache).start_chat()
+
+    def delete(self, cache):
+        cache.delete()
+
+
+class Conversation:
+    """Follow-up questions about one uploaded video, kept in st.session_state.
+
+    The video is uploaded (or reused from the FileRegistry) once. When the
+    media prefix can be cached, every turn only sends the new question to a
+    chat over the cached context; otherwise a per-conversation agent replays
+    its history and references the already-active remote file again. Turns
+    can also be answered from the response cache, keyed on the conversation
+    so far; the model is told about them with the next question it gets.
+    """
+
+    def __init__(self, core, path, digest, agent_factory, context_cache=None):
+        self.core = core
+        self.path = path
+        self.digest = digest
+        self.agent_factory = agent_factory
+        self.context_cache = context_cache
+        self.turns = []
+        self.mode = None
+        self.fallback_reason = None
+        self._video_file = None
+        self._cache = None
+        self._chat = None
+        self._agent = None
+        self._response = None
+        # Turns the model hasn't seen: answered from the response cache
+        self._unsent = []
+        self._lock = threading.Lock()
+
+    def ask(self, question, note=None):
+        # Streams the answer text; the turn is recorded once the stream has been consumed.
+        # The upload and the context cache take governor slots of their own, so they run here,
+        # before the stream claims one: waiting for a slot while holding one can deadlock.
+        self._start(note)
+        prompt = video_prompt(question) if len(self.turns) == len(self._unsent) else question
+        if self._unsent:
+            prompt = recap_prompt(self._unsent, prompt)
+        return self._turn(question, self.core.governor.stream("generate", lambda: self._send(prompt)))
+
+    def cache_variant(self):
+        # Response cache variant for the next question: an answer depends on every turn before it
+        transcript = "\n".join(f"{turn.question}\n{turn.answer}" for turn in self.turns)
+        return ":conversation:" + hashlib.sha256(transcript.encode("utf-8")).hexdigest()
+
+    def add_cached_turn(self, question, answer):
+        turn = Turn(question, answer, 0.0, "cache")
+        self.turns.append(turn)
+        self._unsent.append(turn)
+
+    def close(self):
+        if self._cache is not None:
+            try:
+                self.context_cache.delete(self._cache)
+            except Exception:
+                pass  # It expires on its own after the TTL
+            self._cache = None
+
+    def _start(self, note):
+        with self._lock:
+            if self.mode is not None:
+                return
+            self._video_file = self.core.upload_video(self.path, self.digest, note)
+            if self.context_cache is not None:
+                try:
+                    self._cache, self._chat = self.core.governor.call(
+                        "context_cache", self.context_cache.create, self._video_file
+                    )
+                    self.mode = "cached"
+                    return
+                except Exception as e:
+                    self.fallback_reason = str(e)
+            self._agent = self.agent_factory()
+            self.mode = "history"
+
+    def _send(self, prompt):
+        # Only the model call itself runs under governor.stream
+        if self.mode == "cached":
+            self._response = self._chat.send_message(prompt, stream=True)
+            return (chunk.text for chunk in self._response)
+        return self._agent.run(prompt, videos=[self._video_file], stream=True)
+
+    def _turn(self, question, chunks):
+        start = time.perf_counter()
+        parts = []
+        for chunk in chunks:
+            text = chunk if isinstance(chunk, str) else chunk.content
+            if isinstance(text, str):
+                parts.append(text)
+            yield chunk
+        if self.mode == "cached":
+            response = self._response
+        else:
+            # phi keeps the metrics of a streamed run on the agent
+            response = getattr(self._agent, "run_response", None)
+        input_tokens, cached_tokens = usage_of(response)
+        turn = Turn(question, "".join(parts), time.perf_counter() - start, self.mode, input_tokens, cached_tokens)
+        self.turns.append(turn)
+        self._unsent = []
+        record(
+            "conversation_turn", turn.seconds, cache_hit=self.mode == "cached",
+            turn=len(self.turns), input_tokens=input_tokens, cached_tokens=cached_tokens,
+        )
@@ -0,0 +1,195 @@
+"""Deterministic local stand-ins for Gemini, the File API and DuckDuckGo.
+
+Used by the benchmark suite and for running the app's pipeline offline.
+Latencies and failures are drawn from seeded generators so two runs with
+the same settings see the same sequence.
+"""
+import itertools
+import math
+import os
+import random
+import threading
+import time
+from concurrent.futures import Future
+from types import SimpleNamespace
+
+from transcode import TranscodeCaps, TranscodeResult
+
+
+class FakeAPIError(Exception):
+    def __init__(self, code):
+        super().__init__(f"HTTP {code}")
+        self.code = code
+
+
+class LatencyModel:
+    """Log-normal latency around `median` seconds; sigma=0 gives a fixed delay."""
+
+    def __init__(self, median=0.05, sigma=0.5, seed=0):
+        self.median = median
+        self.sigma = sigma
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def sample(self):
+        if not self.sigma:
+            return self.median
+        with self._lock:
+            return self.median * math.exp(self._random.gauss(0, self.sigma))
+
+
+class FaultModel:
+    """Raises FakeAPIError for a seeded fraction of calls (429 or 503)."""
+
+    def __init__(self, error_rate=0.0, throttle_share=0.5, seed=1):
+        self.error_rate = error_rate
+        self.throttle_share = throttle_share
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def maybe_fail(self):
+        if not self.error_rate:
+            return
+        with self._lock:
+            failed = self._random.random() < self.error_rate
+            code = 429 if self._random.random() < self.throttle_share else 503
+        if failed:
+            raise FakeAPIError(code)
+
+
+class FakeAgent:
+    """Mimics phi's Agent.run for images and videos, optionally calling a search tool."""
+
+    def __init__(self, latency=None, first_token=None, faults=None, search=None,
+                 searches_per_run=1, answer_words=200, chunk_words=8):
+        self.latency = latency or LatencyModel(median=0.5)
+        self.first_token = first_token or LatencyModel(median=0.2)
+        self.faults = faults or FaultModel()
+        self.search = search
+        self.searches_per_run = searches_per_run
+        self.answer_words = answer_words
+        self.chunk_words = chunk_words
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def run(self, prompt, images=None, videos=None, stream=False, **kwargs):
+        with self._lock:
+            self.calls += 1
+        self.faults.maybe_fail()
+        if self.search is not None:
+            for i in range(self.searches_per_run):
+                self.search(f"{prompt[:40]} {i}")
+        words = [f"word{i}" for i in range(self.answer_words)]
+        if stream:
+            return self._stream(words)
+        time.sleep(self.latency.sample())
+        return SimpleNamespace(content=" ".join(words))
+
+    def _stream(self, words):
+        total = self.latency.sample()
+        first = min(self.first_token.sample(), total)
+        time.sleep(first)
+        chunks = [words[i:i + self.chunk_words] for i in range(0, len(words), self.chunk_words)]
+        per_chunk = (total - first) / max(len(chunks), 1)
+        for chunk in chunks:
+            yield SimpleNamespace(content=" ".join(chunk) + " ")
+            time.sleep(per_chunk)
+
+
+class FakeFileBackend:
+    """In-process stand-in for upload_file/get_file, used for offline runs."""
+
+    def __init__(self, processing_polls=1):
+        self.processing_polls = processing_polls
+        self.files = {}
+        self.uploads = 0
+        self.gets = 0
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def upload(self, path):
+        with self._lock:
+            self.uploads += 1
+            name = f"files/fake-{next(self._ids)}"
+            self.files[name] = {"path": str(path), "polls_left": self.processing_polls}
+        return self._handle(name)
+
+    def get(self, name):
+        with self._lock:
+            self.gets += 1
+            if name not in self.files:
+                raise KeyError(name)
+            record = self.files[name]
+            if record["polls_left"] > 0:
+                record["polls_left"] -= 1
+        return self._handle(name)
+
+    def delete(self, name):
+        with self._lock:
+            self.files.pop(name, None)
+
+    def _handle(self, name):
+        record = self.files[name]
+        state = "PROCESSING" if record["polls_left"] > 0 else "ACTIVE"
+        return SimpleNamespace(name=name, state=SimpleNamespace(name=state))
+
+
+class FakeSearchBackend:
+    """Local stand-in for DuckDuckGo with a fixed latency."""
+
+    def __init__(self, latency=0.05):
+        self.latency = latency
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def search(self, query, max_results=5):
+        with self._lock:
+            self.calls += 1
+        time.sleep(self.latency)
+        return f'[{{"title": "Result for {query}", "max_results": {max_results}}}]'
+
+
+class SlowFileBackend(FakeFileBackend):
+    """FakeFileBackend with upload/get latency and fault injection."""
+
+    def __init__(self, processing_polls=2, upload_latency=None, get_latency=None, faults=None):
+        super().__init__(processing_polls)
+        self.upload_latency = upload_latency or LatencyModel(median=0.2)
+        self.get_latency = get_latency or LatencyModel(median=0.02)
+        self.faults = faults or FaultModel()
+
+    def upload(self, path):
+        time.sleep(self.upload_latency.sample())
+        self.faults.maybe_fail()
+        return super().upload(path)
+
+    def get(self, name):
+        time.sleep(self.get_latency.sample())
+        self.faults.maybe_fail()
+        return super().get(name)
+
+
+class SlowSearchBackend(FakeSearchBackend):
+    def __init__(self, latency=None):
+        super().__init__(latency=0)
+        self.latency_model = latency or LatencyModel(median=0.3)
+
+    def search(self, query, max_results=5):
+        time.sleep(self.latency_model.sample())
+        return super().search(query, max_results)
+
+
+class PassthroughTranscoder:
+    """Transcoder stand-in that never re-encodes (no ffmpeg needed)."""
+
+    def __init__(self, caps=None):
+        self.caps = caps or TranscodeCaps()
+
+    def submit(self, source, source_digest):
+        future = Future()
+        size = os.path.getsize(source)
+        future.set_result(TranscodeResult(str(source), f"{source_digest}-{self.caps.key}", size, size, True))
+        return future
+
+    def release(self, source_digest):
+        pass
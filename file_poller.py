@@ -0,0 +1,131 @@
+import asyncio
+import heapq
+import itertools
+import random
+import threading
+import time
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+
+# Rough rate at which Gemini finishes processing uploaded video, used for the first wait
+PROCESSING_BYTES_PER_SECOND = 20 * 1024 * 1024
+MIN_INTERVAL = 0.25
+MAX_INTERVAL = 10.0
+BACKOFF_FACTOR = 1.6
+JITTER = 0.2
+DEFAULT_TIMEOUT = 15 * 60
+
+
+class FileProcessingError(RuntimeError):
+    pass
+
+
+@dataclass(order=True)
+class _Pending:
+    due: float
+    seq: int
+    name: str = field(compare=False)
+    interval: float = field(compare=False)
+    deadline: float = field(compare=False)
+    future: Future = field(compare=False)
+
+
+class FilePoller:
+    """Watches uploaded files until Gemini finishes processing them.
+
+    One background thread serves every pending file. Each file is first
+    checked after a delay estimated from its size, then with exponential
+    backoff plus jitter until it becomes ACTIVE, fails or hits its deadline.
+    """
+
+    def __init__(self, get_file, min_interval=MIN_INTERVAL, max_interval=MAX_INTERVAL,
+                 clock=time.monotonic):
+        self.get_file = get_file
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.clock = clock
+        self.polls = 0
+        self._heap = []
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._thread = threading.Thread(target=self._run, name="file-poller", daemon=True)
+        self._thread.start()
+
+    def submit(self, handle, size_bytes=None, timeout=DEFAULT_TIMEOUT):
+        future = Future()
+        if handle.state.name != "PROCESSING":
+            self._settle(future, handle)
+            return future
+        first = self.estimate_wait(size_bytes)
+        now = self.clock()
+        pending = _Pending(now + first, next(self._seq), handle.name, first, now + timeout, future)
+        with self._cond:
+            heapq.heappush(self._heap, pending)
+            self._cond.notify()
+        return future
+
+    async def wait(self, handle, size_bytes=None, timeout=DEFAULT_TIMEOUT):
+        return await asyncio.wrap_future(self.submit(handle, size_bytes, timeout))
+
+    def estimate_wait(self, size_bytes):
+        if not size_bytes:
+            return self.min_interval
+        estimate = size_bytes / PROCESSING_BYTES_PER_SECOND
+        return min(max(estimate, self.min_interval), self.max_interval)
+
+    def pending(self):
+        with self._cond:
+            return len(self._heap)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._heap:
+                    self._cond.wait()
+                wait = self._heap[0].due - self.clock()
+                if wait > 0:
+                    self._cond.wait(wait)
+                    continue
+                pending = heapq.heappop(self._heap)
+            if pending.future.cancelled():
+                continue
+            self._poll(pending)
+
+    def _poll(self, pending):
+        try:
+            self.polls += 1
+            handle = self.get_file(pending.name)
+        except Exception as e:
+            if not pending.future.done():
+                pending.future.set_exception(e)
+            return
+        if handle.state.name != "PROCESSING":
+            self._settle(pending.future, handle)
+            return
+        now = self.clock()
+        if now >= pending.deadline:
+            if pending.future.done():
+                return
+            pending.future.set_exception(
+                TimeoutError(f"{pending.name} still processing after deadline")
+            )
+            return
+        interval = min(pending.interval * BACKOFF_FACTOR, self.max_interval)
+        jittered = interval * random.uniform(1 - JITTER, 1 + JITTER)
+        pending.interval = interval
+        pending.due = min(now + jittered, pending.deadline)
+        pending.seq = next(self._seq)
+        with self._cond:
+            heapq.heappush(self._heap, pending)
+            self._cond.notify()
+
+    @staticmethod
+    def _settle(future, handle):
+        if future.done():
+            return
+        if handle.state.name == "ACTIVE":
+            future.set_result(handle)
+        else:
+            future.set_exception(
+                FileProcessingError(f"{handle.name} finished in state {handle.state.name}")
+            )
@@ -0,0 +1,137 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+
+from metrics import span
+
+CHUNK_SIZE = 1024 * 1024
+
+# Files uploaded through the Gemini File API are deleted 48 hours after upload
+REMOTE_FILE_TTL = 48 * 60 * 60
+
+
+def sha256_file(path, chunk_size=CHUNK_SIZE):
+    # Stream the file through the hash so large videos never sit in memory
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class GeminiFileBackend:
+    """Talks to the real Gemini File API."""
+
+    def upload(self, path):
+        from google.generativeai import upload_file
+        return upload_file(path)
+
+    def get(self, name):
+        from google.generativeai import get_file
+        return get_file(name)
+
+
+@dataclass
+class RegistryEntry:
+    digest: str
+    name: str
+    state: str
+    uploaded_at: float
+    last_used: float
+
+
+class FileRegistry:
+    """Maps video content hashes to files already uploaded to Gemini.
+
+    Entries expire with the remote file (ttl) and the least recently used
+    ones are dropped once max_entries is reached.
+    """
+
+    def __init__(self, backend=None, ttl=REMOTE_FILE_TTL, max_entries=256, clock=time.time):
+        self.backend = backend or GeminiFileBackend()
+        # Leave some headroom so we never hand out a file that is about to expire
+        self.ttl = ttl * 0.9
+        self.max_entries = max_entries
+        self.clock = clock
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        # digest -> [lock, holders]; only digests with an upload or lookup in progress have one
+        self._upload_locks = {}
+
+    def get_or_upload(self, path, digest=None):
+        digest = digest or sha256_file(path)
+        with self._upload_lock(digest), span("upload_file") as upload:
+            handle = self._lookup(digest)
+            upload.cache_hit = handle is not None
+            if handle is not None:
+                return handle
+            upload.bytes = Path(path).stat().st_size
+            handle = self.backend.upload(path)
+            now = self.clock()
+            with self._lock:
+                self.misses += 1
+                self._entries[digest] = RegistryEntry(digest, handle.name, handle.state.name, now, now)
+                self._entries.move_to_end(digest)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+            return handle
+
+    def mark(self, digest, handle):
+        # Record the latest known state after the caller has polled the file
+        with self._lock:
+            entry = self._entries.get(digest)
+            if entry is not None and entry.name == handle.name:
+                entry.state = handle.state.name
+
+    def discard(self, digest):
+        with self._lock:
+            self._entries.pop(digest, None)
+
+    def stats(self):
+        with self._lock:
+            return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+    def _lookup(self, digest):
+        now = self.clock()
+        with self._lock:
+            entry = self._entries.get(digest)
+            if entry is None:
+                return None
+            if now - entry.uploaded_at > self.ttl:
+                del self._entries[digest]
+                return None
+        # Make sure the remote handle is still usable before reusing it
+        try:
+            handle = self.backend.get(entry.name)
+        except Exception:
+            handle = None
+        with self._lock:
+            if handle is None or handle.state.name not in ("ACTIVE", "PROCESSING"):
+                self._entries.pop(digest, None)
+                return None
+            entry.state = handle.state.name
+            entry.last_used = now
+            self._entries.move_to_end(digest)
+            self.hits += 1
+        return handle
+
+    @contextmanager
+    def _upload_lock(self, digest):
+        # Serializes uploads of the same digest; the lock goes away with its last holder
+        with self._lock:
+            slot = self._upload_locks.setdefault(digest, [threading.Lock(), 0])
+            slot[1] += 1
+        try:
+            with slot[0]:
+                yield
+        finally:
+            with self._lock:
+                slot[1] -= 1
+                if slot[1] == 0:
+                    del self._upload_locks[digest]
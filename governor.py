@@ -0,0 +1,263 @@
+import os
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+RETRYABLE_STATUS = {408, 429, 500, 502, 503, 504}
+THROTTLE_STATUS = {429, 503}
+RETRYABLE_NAMES = {
+    "ResourceExhausted", "TooManyRequests", "ServiceUnavailable", "InternalServerError",
+    "DeadlineExceeded", "GatewayTimeout", "BadGateway", "RateLimitError",
+}
+THROTTLE_NAMES = {"ResourceExhausted", "TooManyRequests", "ServiceUnavailable", "RateLimitError"}
+
+
+def status_of(error):
+    for attr in ("code", "status_code", "status"):
+        value = getattr(error, attr, None)
+        if isinstance(value, int):
+            return value
+    return None
+
+
+def is_throttle(error):
+    return status_of(error) in THROTTLE_STATUS or type(error).__name__ in THROTTLE_NAMES
+
+
+def is_retryable(error):
+    return (
+        status_of(error) in RETRYABLE_STATUS
+        or type(error).__name__ in RETRYABLE_NAMES
+        or isinstance(error, (ConnectionError, TimeoutError))
+    )
+
+
+def friendly_error(error):
+    if is_throttle(error):
+        return "The model is over its request quota right now. Please try again in a minute."
+    return f"An error occurred: {str(error)}"
+
+
+class AIMDLimiter:
+    """Concurrency limit that grows by one per window of successes and halves on throttling."""
+
+    def __init__(self, initial=8, minimum=1, maximum=64, backoff=0.5):
+        self.limit = float(initial)
+        self.minimum = minimum
+        self.maximum = maximum
+        self.backoff = backoff
+        self.in_flight = 0
+        self.waiting = 0
+        self._cond = threading.Condition()
+
+    def acquire(self):
+        with self._cond:
+            self.waiting += 1
+            try:
+                while self.in_flight >= int(self.limit):
+                    self._cond.wait()
+            finally:
+                self.waiting -= 1
+            self.in_flight += 1
+
+    def release(self, throttled=False):
+        with self._cond:
+            self.in_flight -= 1
+            if throttled:
+                self.limit = max(self.minimum, self.limit * self.backoff)
+            else:
+                self.limit = min(self.maximum, self.limit + 1.0 / self.limit)
+            self._cond.notify_all()
+
+
+class TokenBucket:
+    def __init__(self, per_minute, burst=None, clock=time.monotonic):
+        self.rate = per_minute / 60.0
+        self.capacity = burst or max(1.0, per_minute / 10.0)
+        self.tokens = self.capacity
+        self.clock = clock
+        self.updated = clock()
+        self._lock = threading.Lock()
+
+    def take(self):
+        # Blocks until a token is available; returns the time spent waiting
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = self.clock()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return waited
+                delay = (1 - self.tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+
+class LatencyWindow:
+    def __init__(self, size=200):
+        self._samples = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def add(self, seconds):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def quantile(self, q, minimum_samples=20):
+        with self._lock:
+            if len(self._samples) < minimum_samples:
+                return None
+            ordered = sorted(self._samples)
+        return ordered[min(int(q * len(ordered)), len(ordered) - 1)]
+
+
+class Governor:
+    """Client-side traffic control for every Gemini model and file call.
+
+    Calls pass through a per-API-key token bucket and an AIMD concurrency
+    limit that shrinks on 429/503 responses, are retried with jittered
+    exponential backoff on transient errors, and idempotent calls can be
+    hedged with a duplicate once they run past the observed p95 latency.
+    """
+
+    def __init__(self, limiter=None, requests_per_minute=None, max_retries=4, base_delay=1.0,
+                 max_delay=30.0, hedge=True, hedge_workers=8):
+        self.limiter = limiter or AIMDLimiter()
+        if requests_per_minute is None:
+            requests_per_minute = float(os.getenv("GEMINI_REQUESTS_PER_MINUTE", 0))
+        self.requests_per_minute = requests_per_minute
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.hedge = hedge
+        self.counters = {"calls": 0, "retries": 0, "throttled": 0, "hedges": 0, "hedge_wins": 0, "failures": 0}
+        self._buckets = {}
+        self._latency = {}
+        self._lock = threading.Lock()
+        self._hedge_pool = ThreadPoolExecutor(max_workers=hedge_workers, thread_name_prefix="hedge")
+
+    def call(self, op, fn, *args, idempotent=False, api_key="default", **kwargs):
+        attempt = 0
+        while True:
+            try:
+                return self._attempt(op, fn, args, kwargs, idempotent, api_key)
+            except Exception as e:
+                if not is_retryable(e) or attempt >= self.max_retries:
+                    self._count("failures")
+                    raise
+                attempt += 1
+                self._count("retries")
+                time.sleep(self._backoff(attempt))
+
+    def stream(self, op, make_iterator, api_key="default"):
+        # Retries are only safe until the first chunk has been handed to the caller
+        attempt = 0
+        while True:
+            self._admit(api_key)
+            throttled = False
+            started = False
+            try:
+                for item in make_iterator():
+                    started = True
+                    yield item
+                return
+            except Exception as e:
+                throttled = is_throttle(e)
+                if throttled:
+                    self._count("throttled")
+                if started or not is_retryable(e) or attempt >= self.max_retries:
+                    self._count("failures")
+                    raise
+            finally:
+                self.limiter.release(throttled)
+            attempt += 1
+            self._count("retries")
+            time.sleep(self._backoff(attempt))
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self.counters)
+        stats.update(
+            limit=round(self.limiter.limit, 2),
+            in_flight=self.limiter.in_flight,
+            queue_depth=self.limiter.waiting,
+        )
+        return stats
+
+    def _attempt(self, op, fn, args, kwargs, idempotent, api_key):
+        self._admit(api_key)
+        throttled = False
+        start = time.perf_counter()
+        try:
+            threshold = self._latency_for(op).quantile(0.95) if (self.hedge and idempotent) else None
+            if threshold is None:
+                result = fn(*args, **kwargs)
+            else:
+                result = self._hedged(fn, args, kwargs, threshold)
+            self._latency_for(op).add(time.perf_counter() - start)
+            return result
+        except Exception as e:
+            throttled = is_throttle(e)
+            if throttled:
+                self._count("throttled")
+            raise
+        finally:
+            self.limiter.release(throttled)
+
+    def _hedged(self, fn, args, kwargs, threshold):
+        primary = self._hedge_pool.submit(fn, *args, **kwargs)
+        done, _ = wait([primary], timeout=threshold)
+        if done:
+            return primary.result()
+        self._count("hedges")
+        backup = self._hedge_pool.submit(fn, *args, **kwargs)
+        done, _ = wait([primary, backup], return_when=FIRST_COMPLETED)
+        winner = done.pop()
+        if winner is backup:
+            self._count("hedge_wins")
+        if winner.exception() is not None:
+            # Fall back to whichever call is still running
+            other = backup if winner is primary else primary
+            return other.result()
+        return winner.result()
+
+    def _admit(self, api_key):
+        if self.requests_per_minute:
+            self._bucket(api_key).take()
+        self.limiter.acquire()
+        self._count("calls")
+
+    def _backoff(self, attempt):
+        # Full jitter: sleep a random amount up to the exponential cap
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    def _bucket(self, api_key):
+        with self._lock:
+            if api_key not in self._buckets:
+                self._buckets[api_key] = TokenBucket(self.requests_per_minute)
+            return self._buckets[api_key]
+
+    def _latency_for(self, op):
+        with self._lock:
+            return self._latency.setdefault(op, LatencyWindow())
+
+    def _count(self, name):
+        with self._lock:
+            self.counters[name] += 1
+
+
+class GovernedFileBackend:
+    """Routes a file backend's upload/get calls through a Governor."""
+
+    def __init__(self, backend, governor):
+        self.backend = backend
+        self.governor = governor
+
+    def upload(self, path):
+        return self.governor.call("upload_file", self.backend.upload, path)
+
+    def get(self, name):
+        return self.governor.call("get_file", self.backend.get, name, idempotent=True)
@@ -0,0 +1,119 @@
+import threading
+from itertools import combinations
+
+# Max differing bits (of 64) for two images to count as the same picture.
+# pHash finds candidates; dHash has to agree as well, which keeps false matches rare.
+PHASH_THRESHOLD = 8
+DHASH_THRESHOLD = 12
+
+
+def hamming(a, b):
+    return (a ^ b).bit_count()
+
+
+class MultiIndex:
+    """Multi-index hashing over 64-bit keys: each key is filed under every one of its bands.
+
+    Keys within max_distance bits of a query differ by at most
+    max_distance // bands bits in at least one band (pigeonhole), so a
+    search only probes each band's table for the query's band value with up
+    to that many bits flipped, then checks the full distance of what it finds.
+    Plain ints and dicts, so importing it costs nothing.
+    """
+
+    def __init__(self, max_distance, bits=64, bands=None):
+        self.max_distance = max_distance
+        # One flipped bit per band keeps the tables fine-grained and the probes few
+        bands = bands or max_distance // 2 + 1
+        radius = max_distance // bands
+        base, extra = divmod(bits, bands)
+        self._bands = []
+        shift = 0
+        for width in [base + 1] * extra + [base] * (bands - extra):
+            flips = [sum(1 << bit for bit in combo)
+                     for flipped in range(radius + 1) for combo in combinations(range(width), flipped)]
+            self._bands.append((shift, (1 << width) - 1, flips, {}))
+            shift += width
+        self._values = {}
+
+    @property
+    def size(self):
+        return len(self._values)
+
+    def add(self, key, value):
+        values = self._values.get(key)
+        if values is not None:
+            values.append(value)
+            return
+        # Values first: a concurrent search may find the key in a band as soon as it is filed
+        self._values[key] = [value]
+        for shift, mask, _, table in self._bands:
+            table.setdefault((key >> shift) & mask, []).append(key)
+
+    def search(self, key, max_distance=None):
+        # [(distance, value)] for every stored key within max_distance, nearest first
+        if max_distance is None:
+            max_distance = self.max_distance
+        elif max_distance > self.max_distance:
+            raise ValueError(f"index built for distances up to {self.max_distance}")
+        seen = set()
+        found = []
+        for shift, mask, flips, table in self._bands:
+            part = (key >> shift) & mask
+            for flip in flips:
+                for candidate in table.get(part ^ flip, ()):
+                    if candidate in seen:
+                        continue
+                    seen.add(candidate)
+                    distance = (candidate ^ key).bit_count()
+                    if distance <= max_distance:
+                        found.extend((distance, value) for value in self._values[candidate])
+        found.sort(key=lambda item: item[0])
+        return found
+
+
+class NearDuplicateIndex:
+    """Maps images to the first near-identical image seen, so answers about it can be reused.
+
+    Images are keyed by their exact sha256; canonical() returns the sha256
+    of an earlier image whose pHash and dHash are both within threshold,
+    or registers the image as its own canonical entry. Lookups don't take
+    the lock; only registering a new image does.
+    """
+
+    def __init__(self, phash_threshold=PHASH_THRESHOLD, dhash_threshold=DHASH_THRESHOLD):
+        self.phash_threshold = phash_threshold
+        self.dhash_threshold = dhash_threshold
+        self.matches = 0
+        self._index = MultiIndex(phash_threshold)
+        self._dhashes = {}
+        self._canonical = {}
+        self._lock = threading.Lock()
+
+    def find(self, phash_value, dhash_value):
+        # Dict and list reads are safe against the single writer under the GIL; a key is only
+        # filed in the index after its dHash is recorded
+        for _, sha256 in self._index.search(phash_value):
+            if hamming(self._dhashes[sha256], dhash_value) <= self.dhash_threshold:
+                return sha256
+        return None
+
+    def canonical(self, sha256, phash_value, dhash_value):
+        match = self._canonical.get(sha256)
+        if match is not None:
+            return match
+        match = self.find(phash_value, dhash_value)
+        with self._lock:
+            if sha256 in self._canonical:
+                return self._canonical[sha256]
+            if match is None:
+                self._dhashes[sha256] = dhash_value
+                self._index.add(phash_value, sha256)
+                match = sha256
+            else:
+                self.matches += 1
+            self._canonical[sha256] = match
+            return match
+
+    def stats(self):
+        return {"hashes": self._index.size, "lookups": len(self._canonical), "near_duplicates": self.matches}
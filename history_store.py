@@ -0,0 +1,220 @@
+import atexit
+import io
+import json
+import queue
+import re
+import sqlite3
+import tempfile
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+
+DEFAULT_PATH = Path(tempfile.gettempdir()) / "multimodal_agent_history.sqlite3"
+THUMBNAIL_SIZE = (128, 128)
+# Matches are ranked by relevance among the most recent RANK_WINDOW of them; bm25 over every
+# match of a common word would cost far more than the rest of the query
+RANK_WINDOW = 1000
+SNIPPET_CHARS = 240
+
+SCHEMA = [
+    "CREATE TABLE IF NOT EXISTS analyses ("
+    " id INTEGER PRIMARY KEY, created_at REAL NOT NULL, media_hash TEXT NOT NULL, kind TEXT NOT NULL,"
+    " prompt TEXT NOT NULL, answer TEXT NOT NULL, model_id TEXT NOT NULL, seconds REAL,"
+    " timings TEXT, thumbnail BLOB, owner TEXT)",
+    "CREATE INDEX IF NOT EXISTS analyses_created_at ON analyses(created_at)",
+    "CREATE INDEX IF NOT EXISTS analyses_media_hash ON analyses(media_hash)",
+    # External-content index: the text lives once, in analyses; triggers keep the index in step
+    "CREATE VIRTUAL TABLE IF NOT EXISTS analyses_fts USING fts5("
+    " prompt, answer, content='analyses', content_rowid='id', tokenize='porter unicode61')",
+    "CREATE TRIGGER IF NOT EXISTS analyses_ai AFTER INSERT ON analyses BEGIN"
+    " INSERT INTO analyses_fts(rowid, prompt, answer) VALUES (new.id, new.prompt, new.answer); END",
+    "CREATE TRIGGER IF NOT EXISTS analyses_ad AFTER DELETE ON analyses BEGIN"
+    " INSERT INTO analyses_fts(analyses_fts, rowid, prompt, answer)"
+    " VALUES ('delete', old.id, old.prompt, old.answer); END",
+]
+# Tables created before analyses had an owner
+MIGRATIONS = [
+    ("owner", "ALTER TABLE analyses ADD COLUMN owner TEXT"),
+]
+OWNER_INDEX = "CREATE INDEX IF NOT EXISTS analyses_owner ON analyses(owner, created_at)"
+
+
+@dataclass
+class HistoryHit:
+    id: int
+    created_at: float
+    media_hash: str
+    kind: str
+    prompt: str
+    snippet: str
+    model_id: str
+    seconds: float
+    thumbnail: bytes
+
+
+def make_thumbnail(image, size=THUMBNAIL_SIZE):
+    # Small JPEG of an already decoded PIL image (e.g. an image preview), for the search results
+    thumbnail = image.copy()
+    thumbnail.thumbnail(size)
+    buffer = io.BytesIO()
+    thumbnail.convert("RGB").save(buffer, format="JPEG", quality=70)
+    return buffer.getvalue()
+
+
+def match_query(text):
+    # Free text to an FTS5 query where every word must appear. The porter tokenizer already
+    # matches other forms of a word; prefix terms would cost several times more per query.
+    words = re.findall(r"\w+", text)
+    if not words:
+        return None
+    return " ".join(f'"{word}"' for word in words)
+
+
+def make_snippet(answer, text, width=SNIPPET_CHARS):
+    # Window of the answer around the first matching word, with matches in bold
+    # Crude suffix stripping so "loads" also highlights "load", roughly as the porter tokenizer matched
+    stems = [re.sub(r"(ing|ed|es|s)$", "", word) if len(word) > 4 else word for word in re.findall(r"\w+", text)]
+    pattern = re.compile("|".join(rf"\b{re.escape(stem)}\w*" for stem in stems), re.IGNORECASE)
+    match = pattern.search(answer)
+    start = max(0, match.start() - width // 3) if match else 0
+    window = answer[start:start + width]
+    window = pattern.sub(lambda m: f"**{m.group(0)}**", window)
+    return ("… " if start else "") + window + (" …" if start + width < len(answer) else "")
+
+
+class HistoryStore:
+    """Every analysis with its prompt, answer and timings, searchable with SQLite FTS5.
+
+    add() only queues the record; a writer thread commits queued records in
+    one transaction every flush_interval seconds (or batch_size records), so
+    the interactive path never waits on the disk. Records may carry an owner
+    (e.g. a session id); search() and recent() can be limited to one owner.
+    """
+
+    def __init__(self, path=DEFAULT_PATH, flush_interval=0.5, batch_size=256, max_pending=10000):
+        self.path = str(path)
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.written = 0
+        self.dropped = 0
+        self._pending = queue.Queue(maxsize=max_pending)
+        self._flushed = threading.Condition()
+        self._lock = threading.Lock()
+        self._db = self._connect()
+        for statement in SCHEMA:
+            self._db.execute(statement)
+        columns = {row[1] for row in self._db.execute("PRAGMA table_info(analyses)")}
+        for column, statement in MIGRATIONS:
+            if column not in columns:
+                self._db.execute(statement)
+        self._db.execute(OWNER_INDEX)
+        threading.Thread(target=self._writer, name="history-writer", daemon=True).start()
+        # The writer is a daemon thread; commit what is still queued when the process exits
+        atexit.register(self.flush)
+
+    def add(self, media_hash, kind, prompt, answer, model_id, seconds=None, timings=None, thumbnail=None, owner=None):
+        record = (time.time(), media_hash, kind, prompt, answer, model_id, seconds,
+                  json.dumps(timings, default=str) if timings is not None else None, thumbnail, owner)
+        try:
+            self._pending.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def search(self, text, limit=20, owner=None):
+        # owner=None searches every record
+        query = match_query(text)
+        if query is None:
+            return self.recent(limit, owner)
+        with self._lock:
+            if owner is None:
+                matches = self._db.execute(
+                    "SELECT rowid FROM (SELECT rowid, bm25(analyses_fts, 2.0, 1.0) AS score FROM analyses_fts"
+                    " WHERE analyses_fts MATCH ? ORDER BY rowid DESC LIMIT ?) ORDER BY score LIMIT ?",
+                    (query, RANK_WINDOW, limit),
+                )
+            else:
+                matches = self._db.execute(
+                    "SELECT rowid FROM (SELECT analyses_fts.rowid AS rowid, bm25(analyses_fts, 2.0, 1.0) AS score"
+                    " FROM analyses_fts JOIN analyses ON analyses.id = analyses_fts.rowid"
+                    " WHERE analyses_fts MATCH ? AND analyses.owner = ? ORDER BY rowid DESC LIMIT ?)"
+                    " ORDER BY score LIMIT ?",
+                    (query, owner, RANK_WINDOW, limit),
+                )
+            ids = [row[0] for row in matches]
+            # Only the rows that are shown are read from the main table
+            rows = {row[0]: row for row in self._db.execute(
+                "SELECT id, created_at, media_hash, kind, prompt, answer, model_id, seconds, thumbnail"
+                f" FROM analyses WHERE id IN ({','.join('?' * len(ids))})",
+                ids,
+            )}
+        hits = []
+        for record_id in ids:
+            row = rows[record_id]
+            hits.append(HistoryHit(*row[:5], make_snippet(row[5], text), *row[6:]))
+        return hits
+
+    def recent(self, limit=20, owner=None):
+        where, params = ("", ()) if owner is None else (" WHERE owner = ?", (owner,))
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT id, created_at, media_hash, kind, prompt, substr(answer, 1, 200), model_id, seconds, thumbnail"
+                f" FROM analyses{where} ORDER BY created_at DESC LIMIT ?",
+                (*params, limit),
+            ).fetchall()
+        return [HistoryHit(*row) for row in rows]
+
+    def answer(self, record_id):
+        with self._lock:
+            row = self._db.execute("SELECT answer, timings FROM analyses WHERE id = ?", (record_id,)).fetchone()
+        if row is None:
+            return None, None
+        return row[0], json.loads(row[1]) if row[1] else None
+
+    def flush(self, timeout=10):
+        # Block until everything queued so far is committed
+        deadline = time.monotonic() + timeout
+        with self._flushed:
+            while self._pending.unfinished_tasks and time.monotonic() < deadline:
+                self._flushed.wait(0.05)
+
+    def stats(self):
+        with self._lock:
+            total = self._db.execute("SELECT COUNT(*) FROM analyses").fetchone()[0]
+        return {"records": total, "pending": self._pending.qsize(), "written": self.written, "dropped": self.dropped}
+
+    def _connect(self):
+        db = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("PRAGMA synchronous=NORMAL")
+        return db
+
+    def _writer(self):
+        db = self._connect()
+        while True:
+            batch = [self._pending.get()]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._pending.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            try:
+                with db:
+                    db.execute("BEGIN")
+                    db.executemany(
+                        "INSERT INTO analyses (created_at, media_hash, kind, prompt, answer, model_id,"
+                        " seconds, timings, thumbnail, owner) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                        batch,
+                    )
+                self.written += len(batch)
+            except sqlite3.Error:
+                self.dropped += len(batch)
+            finally:
+                for _ in batch:
+                    self._pending.task_done()
+                with self._flushed:
+                    self._flushed.notify_all()
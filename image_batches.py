@@ -0,0 +1,141 @@
+import json
+import math
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+
+# Gemini bills an image up to 384px on both sides as 258 tokens; larger ones are cut into 768px tiles
+IMAGE_TOKENS = 258
+SMALL_IMAGE_SIDE = 384
+TILE_SIDE = 768
+
+MAX_IMAGES = int(os.getenv("IMAGE_BATCH_MAX_IMAGES", 8))
+MAX_TOKENS = int(os.getenv("IMAGE_BATCH_MAX_TOKENS", 4096))
+# Inline request payloads are capped at 20 MB; stay well below it
+MAX_BYTES = int(os.getenv("IMAGE_BATCH_MAX_BYTES", 8 * 1024 * 1024))
+
+
+def image_tokens(renditions):
+    width, height = renditions.preview.size
+    if max(width, height) <= SMALL_IMAGE_SIDE:
+        return IMAGE_TOKENS
+    return IMAGE_TOKENS * math.ceil(width / TILE_SIDE) * math.ceil(height / TILE_SIDE)
+
+
+@dataclass
+class BatchItem:
+    index: int
+    name: str
+    renditions: object
+    tokens: int
+    bytes: int
+
+
+class BatchPlanner:
+    """Packs images into as few model requests as the token/byte/count budget allows, in upload order."""
+
+    def __init__(self, max_images=MAX_IMAGES, max_tokens=MAX_TOKENS, max_bytes=MAX_BYTES):
+        self.max_images = max_images
+        self.max_tokens = max_tokens
+        self.max_bytes = max_bytes
+
+    def plan(self, named_renditions):
+        batches = []
+        batch, tokens, size = [], 0, 0
+        for index, (name, renditions) in enumerate(named_renditions):
+            item = BatchItem(index, name, renditions, image_tokens(renditions), len(renditions.model_jpeg))
+            full = (
+                len(batch) >= self.max_images
+                or tokens + item.tokens > self.max_tokens
+                or size + item.bytes > self.max_bytes
+            )
+            if batch and full:
+                batches.append(batch)
+                batch, tokens, size = [], 0, 0
+            batch.append(item)
+            tokens += item.tokens
+            size += item.bytes
+        if batch:
+            batches.append(batch)
+        return batches
+
+
+def batch_prompt(question, items):
+    names = "\n".join(f"{i}. {item.name}" for i, item in enumerate(items, 1))
+    return f"""
+    You are given {len(items)} images, attached in this order:
+    {names}
+
+    Answer the following question separately for each image: {question}
+
+    Reply with JSON only, no code fences, in the form
+    {{"answers": [{{"image": 1, "answer": "<markdown answer for image 1>"}}, ...]}}
+    with exactly one entry per image.
+    """
+
+
+def split_answers(text, count):
+    # {image number: answer}; images the model skipped or mangled are left out
+    text = text.strip()
+    fenced = re.match(r"^```(?:json)?\s*(.*?)\s*```$", text, re.DOTALL)
+    if fenced:
+        text = fenced.group(1)
+    try:
+        entries = json.loads(text[text.index("{"):text.rindex("}") + 1])["answers"]
+    except (ValueError, KeyError, TypeError):
+        return {}
+    answers = {}
+    for entry in entries if isinstance(entries, list) else []:
+        try:
+            number = int(entry["image"])
+        except (KeyError, TypeError, ValueError):
+            continue
+        if 1 <= number <= count and isinstance(entry.get("answer"), str):
+            answers[number] = entry["answer"]
+    return answers
+
+
+def analyze_batch(core, items, question):
+    # One model call for the batch; images missing from its answer get a call of their own
+    response = core.run_agent(batch_prompt(question, items), images=[item.renditions.model_jpeg for item in items])
+    answers = split_answers(response.content, len(items))
+    results = []
+    for number, item in enumerate(items, 1):
+        answer = answers.get(number)
+        if answer is None:
+            answer = core.run_image(item.renditions, question).content
+        results.append((item, answer))
+    return results
+
+
+def analyze_images(core, named_renditions, question, planner=None, max_parallel=4):
+    # Yields (name, answer, cached) per image in upload order, each as soon as it and every image
+    # before it are answered; batches run in parallel but the output never depends on which finishes first
+    planner = planner or BatchPlanner()
+    answers, cached = {}, set()
+    pending, keys, positions = [], [], []
+    for index, (name, renditions) in enumerate(named_renditions):
+        key = core.cache_key(core.image_media_hash(renditions), question)
+        answer = core.response_cache.get(key)
+        if answer is not None:
+            answers[index] = answer
+            cached.add(index)
+        else:
+            pending.append((name, renditions))
+            keys.append(key)
+            positions.append(index)
+
+    pool = ThreadPoolExecutor(max_workers=max_parallel, thread_name_prefix="image-batch")
+    try:
+        # Batches hold consecutive images, so waiting on them in submission order follows upload order
+        batches = iter([pool.submit(analyze_batch, core, batch, question) for batch in planner.plan(pending)])
+        for index, (name, _) in enumerate(named_renditions):
+            while index not in answers:
+                for item, answer in next(batches).result():
+                    core.response_cache.put(keys[item.index], answer)
+                    answers[positions[item.index]] = answer
+            yield name, answers.pop(index), index in cached
+    finally:
+        # Drop batches that haven't started if the caller stops early (e.g. the job was cancelled)
+        pool.shutdown(wait=False, cancel_futures=True)
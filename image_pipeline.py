@@ -0,0 +1,126 @@
+import hashlib
+import io
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+
+from metrics import span
+
+PREVIEW_SIZE = (500, 300)
+JPEG_QUALITY = 85
+
+
+@dataclass
+class ImageRenditions:
+    sha256: str
+    # PIL image, or None once dropped; PIL is only imported where images are decoded
+    _preview: object
+    model_jpeg: bytes
+    source_size: tuple
+    # Perceptual hashes of the preview, for spotting re-saved or lightly cropped copies
+    phash: int = None
+    dhash: int = None
+    # Full footprint, preview included, whether or not the preview is currently held
+    nbytes: int = field(init=False)
+
+    def __post_init__(self):
+        self.nbytes = self.preview_bytes + len(self.model_jpeg)
+
+    @property
+    def preview(self):
+        # The model JPEG is an encoding of the preview, so a dropped preview is decoded again from it
+        # One read of _preview: the memory governor's thread may drop it between two
+        image = self._preview
+        if image is None:
+            from PIL import Image
+
+            image = Image.open(io.BytesIO(self.model_jpeg))
+            image.load()
+            self._preview = image
+        return image
+
+    @property
+    def preview_bytes(self):
+        image = self._preview
+        if image is None:
+            return 0
+        width, height = image.size
+        return width * height * len(image.getbands())
+
+    def drop_preview(self):
+        # Returns the bytes released; the next access to .preview decodes it again
+        released = self.preview_bytes
+        self._preview = None
+        return released
+
+
+def read_image_bytes(image_data):
+    # Streamlit's UploadedFile is a BytesIO over the upload's bytes: read() from the start hands
+    # back that bytes object itself, while getbuffer() would copy it first
+    if hasattr(image_data, "read"):
+        image_data.seek(0)
+        return image_data.read()
+    return image_data
+
+
+def resize_image(image_data, max_width=PREVIEW_SIZE[0], max_height=PREVIEW_SIZE[1]):
+    # Imported here so Pillow loads on the first image, not at app start
+    from PIL import Image
+
+    image = Image.open(image_data)
+    source_size = image.size
+    # For JPEGs, let libjpeg decode straight at a reduced scale instead of the full resolution
+    if image.format == "JPEG":
+        image.draft("RGB", (max_width, max_height))
+    image.thumbnail((max_width, max_height))  # Resize the image while maintaining aspect ratio
+    image.info["source_size"] = source_size
+    return image
+
+
+class ImagePipeline:
+    """Memoizes the preview and model-input renditions of uploaded images by content hash."""
+
+    def __init__(self, max_bytes=64 * 1024 * 1024, size=PREVIEW_SIZE, quality=JPEG_QUALITY):
+        self.max_bytes = max_bytes
+        self.size = size
+        self.quality = quality
+        self.hits = 0
+        self.misses = 0
+        self.total_bytes = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def prepare(self, image_data):
+        data = read_image_bytes(image_data)
+        with span("image_prepare", bytes=len(data)) as prepare:
+            renditions, prepare.cache_hit = self._prepare(data)
+            return renditions
+
+    def _prepare(self, data):
+        digest = hashlib.sha256(data).hexdigest()
+        with self._lock:
+            renditions = self._entries.get(digest)
+            if renditions is not None:
+                self._entries.move_to_end(digest)
+                self.hits += 1
+                return renditions, True
+
+        from perceptual_hash import image_hashes
+
+        image = resize_image(io.BytesIO(data), *self.size)
+        source_size = image.info["source_size"]
+        # Convert image to RGB before encoding as JPEG
+        preview = image.convert("RGB")
+        buffer = io.BytesIO()
+        preview.save(buffer, format="JPEG", quality=self.quality)
+        renditions = ImageRenditions(digest, preview, buffer.getvalue(), source_size, *image_hashes(preview))
+
+        with self._lock:
+            self.misses += 1
+            if digest not in self._entries:
+                self._entries[digest] = renditions
+                self.total_bytes += renditions.nbytes
+            while self.total_bytes > self.max_bytes and len(self._entries) > 1:
+                _, evicted = self._entries.popitem(last=False)
+                self.total_bytes -= evicted.nbytes
+        return renditions, False
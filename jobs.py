@@ -0,0 +1,191 @@
+import itertools
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from metrics import Trace, trace_context
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+FINISHED = (DONE, FAILED, CANCELLED)
+
+
+class JobLimitError(RuntimeError):
+    pass
+
+
+class JobCancelled(Exception):
+    pass
+
+
+class Job:
+    """One analysis running on the JobQueue.
+
+    The worker publishes partial output through markdown() (so a job can
+    stand in for a Streamlit placeholder in render_stream) and notes through
+    note(); the UI reads them from any rerun. Identical requests from other
+    sessions subscribe to the same job instead of starting their own.
+    """
+
+    def __init__(self, job_id, owner, label, key=None):
+        self.id = job_id
+        self.owner = owner
+        self.owners = {owner}
+        self.key = key
+        self.label = label
+        self.status = QUEUED
+        self.partial = ""
+        self.notes = []
+        self.result = None
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        # Timing spans recorded while the job runs
+        self.trace = Trace()
+        self._cancel = threading.Event()
+
+    @property
+    def finished(self):
+        return self.status in FINISHED
+
+    @property
+    def cancel_requested(self):
+        return self._cancel.is_set()
+
+    def markdown(self, text):
+        self.check_cancelled()
+        self.partial = text
+
+    def note(self, text):
+        self.notes.append(text)
+
+    def check_cancelled(self):
+        if self._cancel.is_set():
+            raise JobCancelled(self.id)
+
+    def watch(self, chunks):
+        # Stop consuming a model stream as soon as the job is cancelled
+        for chunk in chunks:
+            self.check_cancelled()
+            yield chunk
+
+
+class JobQueue:
+    """Bounded worker pool for analyses, decoupled from Streamlit script runs.
+
+    Jobs submitted with a coalesce_key are shared: while one is queued or
+    running, identical submissions from any session attach to it, and it is
+    only cancelled once every subscribed session has cancelled or gone away.
+    """
+
+    def __init__(self, max_workers=8, max_queued=64, per_owner_limit=2, keep_finished=500):
+        self.max_queued = max_queued
+        self.per_owner_limit = per_owner_limit
+        self.keep_finished = keep_finished
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="analysis")
+        self._jobs = OrderedDict()
+        self._inflight = {}
+        self.coalesced = 0
+        self._lock = threading.Lock()
+
+    def submit(self, owner, label, fn, *args, coalesce_key=None, **kwargs):
+        # fn(job, *args, **kwargs) runs on a worker thread; its return value becomes job.result
+        with self._lock:
+            active = [job for job in self._jobs.values() if not job.finished]
+            shared = self._inflight.get(coalesce_key) if coalesce_key is not None else None
+            if shared is not None and owner in shared.owners:
+                return shared
+            if sum(owner in job.owners for job in active) >= self.per_owner_limit:
+                raise JobLimitError(
+                    f"You already have {self.per_owner_limit} analyses running; wait for one to finish."
+                )
+            if shared is not None:
+                shared.owners.add(owner)
+                self.coalesced += 1
+                return shared
+            if len(active) >= self.max_queued:
+                raise JobLimitError("The server is busy, please try again in a moment.")
+            job = Job(uuid.uuid4().hex, owner, label, coalesce_key)
+            self._jobs[job.id] = job
+            if coalesce_key is not None:
+                self._inflight[coalesce_key] = job
+            self._prune()
+        self._pool.submit(self._run, job, fn, args, kwargs)
+        return job
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def cancel(self, job_id, owner=None):
+        # With an owner, only that session unsubscribes; the job stops once nobody is left
+        job = self.get(job_id)
+        if job is None or job.finished:
+            return False
+        with self._lock:
+            if owner is not None:
+                job.owners.discard(owner)
+                if job.owners:
+                    return True
+            job._cancel.set()
+            self._forget(job)
+            if job.status == QUEUED:
+                job.status = CANCELLED
+                job.finished_at = time.time()
+        return True
+
+    def cancel_owner(self, owner):
+        with self._lock:
+            ids = [job.id for job in self._jobs.values() if owner in job.owners and not job.finished]
+        for job_id in ids:
+            self.cancel(job_id, owner)
+
+    def owners(self):
+        # Sessions with queued or running jobs
+        with self._lock:
+            return set().union(*(job.owners for job in self._jobs.values() if not job.finished))
+
+    def stats(self):
+        with self._lock:
+            counts = {status: 0 for status in (QUEUED, RUNNING) + FINISHED}
+            for job in self._jobs.values():
+                counts[job.status] += 1
+            return counts
+
+    def _run(self, job, fn, args, kwargs):
+        with self._lock:
+            if job.status != QUEUED:
+                return
+            job.status = RUNNING
+            job.started_at = time.time()
+        try:
+            with trace_context(job.trace):
+                result = fn(job, *args, **kwargs)
+        except JobCancelled:
+            status, result, error = CANCELLED, None, None
+        except Exception as e:
+            status, result, error = FAILED, None, e
+        else:
+            status, error = (CANCELLED if job.cancel_requested else DONE), None
+        with self._lock:
+            job.result = result
+            job.error = error
+            job.status = status
+            job.finished_at = time.time()
+            self._forget(job)
+
+    def _forget(self, job):
+        # Later identical requests start a fresh job (or hit the response cache) instead of attaching
+        if job.key is not None and self._inflight.get(job.key) is job:
+            del self._inflight[job.key]
+
+    def _prune(self):
+        finished = [job_id for job_id, job in self._jobs.items() if job.finished]
+        for job_id in itertools.islice(finished, max(len(finished) - self.keep_finished, 0)):
+            del self._jobs[job_id]
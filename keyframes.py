@@ -0,0 +1,142 @@
+import io
+import os
+from dataclasses import dataclass, field
+
+import imageio_ffmpeg
+import numpy as np
+from PIL import Image
+
+# Frames are decoded no larger than this before anything else happens
+DECODE_WIDTH = 640
+# Scene changes are detected on tiny grayscale signatures of each frame
+SIGNATURE_SIZE = (32, 18)
+SCENE_THRESHOLD = 12.0
+MIN_GAP_SECONDS = 2.0
+MAX_KEYFRAMES = 48
+BATCH_FRAMES = 64
+JPEG_QUALITY = 80
+
+
+@dataclass
+class Keyframe:
+    timestamp: float
+    jpeg: bytes
+
+
+@dataclass
+class KeyframeResult:
+    keyframes: list = field(default_factory=list)
+    source_bytes: int = 0
+    frames_decoded: int = 0
+    duration: float = 0.0
+
+    @property
+    def payload_bytes(self):
+        return sum(len(frame.jpeg) for frame in self.keyframes)
+
+    @property
+    def saved_bytes(self):
+        return max(self.source_bytes - self.payload_bytes, 0)
+
+    @property
+    def saved_ratio(self):
+        return self.saved_bytes / self.source_bytes if self.source_bytes else 0.0
+
+
+def probe(path):
+    reader = imageio_ffmpeg.read_frames(path)
+    try:
+        return next(reader)
+    finally:
+        reader.close()
+
+
+def decode_size(source_size, max_width=DECODE_WIDTH):
+    width, height = source_size
+    if width <= max_width:
+        return width - width % 2, height - height % 2
+    scaled_height = int(height * max_width / width)
+    return max_width, scaled_height - scaled_height % 2
+
+
+def signatures(frames):
+    # frames: (n, h, w, 3) uint8 -> (n, sh, sw) float32 block means of the luma channel
+    sig_w, sig_h = SIGNATURE_SIZE
+    frames = frames[:, ::2, ::2]
+    n, h, w, _ = frames.shape
+    luma = frames @ np.array([0.299, 0.587, 0.114], dtype=np.float32)
+    bh, bw = h // sig_h, w // sig_w
+    luma = luma[:, :bh * sig_h, :bw * sig_w]
+    return luma.reshape(n, sig_h, bh, sig_w, bw).mean(axis=(2, 4))
+
+
+def encode_jpeg(frame, quality=JPEG_QUALITY):
+    buffer = io.BytesIO()
+    Image.fromarray(frame).save(buffer, format="JPEG", quality=quality)
+    return buffer.getvalue()
+
+
+def extract_keyframes(path, threshold=SCENE_THRESHOLD, min_gap=MIN_GAP_SECONDS,
+                      max_keyframes=MAX_KEYFRAMES, max_width=DECODE_WIDTH):
+    """Stream-decode a video and keep one frame per detected scene."""
+    meta = probe(path)
+    fps = meta.get("fps") or 25.0
+    width, height = decode_size(meta["size"], max_width)
+    frame_bytes = width * height * 3
+    result = KeyframeResult(source_bytes=os.path.getsize(path), duration=meta.get("duration") or 0.0)
+
+    reader = imageio_ffmpeg.read_frames(path, output_params=["-vf", f"scale={width}:{height}"])
+    next(reader)
+    previous = None
+    last_kept_at = -min_gap
+    batch = []
+    index = 0
+
+    def flush(batch, index_start):
+        nonlocal previous, last_kept_at
+        frames = np.frombuffer(b"".join(batch), dtype=np.uint8).reshape(len(batch), height, width, 3)
+        sigs = signatures(frames)
+        if previous is None:
+            diffs = np.full(len(sigs), np.inf, dtype=np.float32)
+            diffs[1:] = np.abs(sigs[1:] - sigs[:-1]).mean(axis=(1, 2))
+        else:
+            diffs = np.abs(sigs - np.concatenate([previous[None], sigs[:-1]])).mean(axis=(1, 2))
+        previous = sigs[-1]
+        for offset in np.flatnonzero(diffs > threshold):
+            timestamp = (index_start + offset) / fps
+            if timestamp - last_kept_at < min_gap:
+                continue
+            result.keyframes.append(Keyframe(round(timestamp, 2), encode_jpeg(frames[offset])))
+            last_kept_at = timestamp
+
+    try:
+        for raw in reader:
+            if len(raw) != frame_bytes:
+                continue
+            batch.append(raw)
+            index += 1
+            if len(batch) == BATCH_FRAMES:
+                flush(batch, index - len(batch))
+                batch = []
+        if batch:
+            flush(batch, index - len(batch))
+    finally:
+        reader.close()
+
+    result.frames_decoded = index
+    if len(result.keyframes) > max_keyframes:
+        # Keep an even spread across the video rather than only the beginning
+        picks = np.linspace(0, len(result.keyframes) - 1, max_keyframes).round().astype(int)
+        result.keyframes = [result.keyframes[i] for i in picks]
+    return result
+
+
+def keyframe_prompt(result, question):
+    timestamps = ", ".join(f"{frame.timestamp:.1f}s" for frame in result.keyframes)
+    return f"""
+    The attached images are keyframes extracted from a video at these timestamps: {timestamps}.
+    First analyze these frames as a video and then answer the following question using both
+    the video analysis and web research: {question}
+
+    Provide a comprehensive response focusing on practical, actionable information.
+    """
@@ -0,0 +1,141 @@
+import subprocess
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+
+import imageio_ffmpeg
+
+from keyframes import probe
+
+DEFAULT_SEGMENT_SECONDS = 10 * 60
+DEFAULT_MAX_PARALLEL = 4
+
+
+@dataclass
+class Segment:
+    index: int
+    start: float
+    end: float
+    path: str
+
+
+@dataclass
+class SegmentFinding:
+    segment: Segment
+    text: str
+    seconds: float
+
+
+@dataclass
+class LongVideoResult:
+    # Whatever reduce returned: the answer text, or a stream of it
+    answer: object
+    findings: list
+    map_seconds: float
+    # Until reduce returned; for a streamed answer that is when the stream opened
+    reduce_seconds: float
+
+
+def format_timestamp(seconds):
+    seconds = int(seconds)
+    return f"{seconds // 3600:02d}:{seconds % 3600 // 60:02d}:{seconds % 60:02d}"
+
+
+def plan_segments(duration, segment_seconds=DEFAULT_SEGMENT_SECONDS):
+    bounds = []
+    start = 0.0
+    while start < duration:
+        end = min(start + segment_seconds, duration)
+        # Fold a short tail into the previous segment instead of uploading a few seconds on their own
+        if bounds and end - start < segment_seconds * 0.25:
+            bounds[-1] = (bounds[-1][0], end)
+        else:
+            bounds.append((start, end))
+        start = end
+    return bounds
+
+
+def split_video(path, out_dir, key, segment_seconds=DEFAULT_SEGMENT_SECONDS, keep=None):
+    # Stream-copy each time range into its own file; no re-encode, so this is I/O bound.
+    # keep(path) is called as soon as each segment file is on disk, e.g. to hold it in a media store
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    duration = probe(path).get("duration") or 0.0
+    segments = []
+    for index, (start, end) in enumerate(plan_segments(duration, segment_seconds)):
+        target = out_dir / f"{key}-{int(segment_seconds)}-{index:03d}.mp4"
+        if not target.exists():
+            partial = f"{target}.partial.mp4"
+            subprocess.run(
+                [imageio_ffmpeg.get_ffmpeg_exe(), "-y", "-loglevel", "error",
+                 "-ss", f"{start:.3f}", "-i", str(path), "-t", f"{end - start:.3f}",
+                 "-c", "copy", "-avoid_negative_ts", "make_zero", partial],
+                check=True, capture_output=True,
+            )
+            Path(partial).replace(target)
+        if keep is not None:
+            keep(target)
+        segments.append(Segment(index, start, end, str(target)))
+    return segments
+
+
+def segment_prompt(segment, question):
+    return f"""
+    This clip is part {segment.index + 1} of a longer recording and covers
+    {format_timestamp(segment.start)} to {format_timestamp(segment.end)} of it.
+    Describe what happens in the clip and note anything relevant to the question below,
+    citing timestamps relative to the full recording (add {format_timestamp(segment.start)} to clip times).
+    Do not search the web for this step. Question: {question}
+    """
+
+
+def reduce_prompt(question, findings):
+    notes = "\n\n".join(
+        f"[{format_timestamp(f.segment.start)} - {format_timestamp(f.segment.end)}]\n{f.text}"
+        for f in findings
+    )
+    return f"""
+    The notes below were written about consecutive parts of one long video.
+    Using these notes and web research where useful, answer the following question: {question}
+
+    Cite timestamps from the notes where they support the answer.
+    Provide a comprehensive response focusing on practical, actionable information.
+
+    {notes}
+    """
+
+
+class MapReduceAnalyzer:
+    """Analyzes a long video as parallel segments and merges the findings.
+
+    upload(segment) returns a model-ready handle, analyze(handle, segment, question)
+    returns the text findings for one segment and reduce(question, findings)
+    produces the final answer; all three are plain callables so a stub model
+    can stand in for Gemini.
+    """
+
+    def __init__(self, upload, analyze, reduce=None, max_parallel=DEFAULT_MAX_PARALLEL):
+        self.upload = upload
+        self.analyze = analyze
+        self.reduce = reduce
+        self.max_parallel = max_parallel
+
+    def map_segments(self, segments, question):
+        def work(segment):
+            start = time.perf_counter()
+            handle = self.upload(segment)
+            text = self.analyze(handle, segment, question)
+            return SegmentFinding(segment, text, time.perf_counter() - start)
+
+        with ThreadPoolExecutor(max_workers=self.max_parallel, thread_name_prefix="segment") as pool:
+            return list(pool.map(work, segments))
+
+    def run(self, segments, question):
+        if not segments:
+            raise ValueError("The video has no readable duration, so it could not be split into segments.")
+        start = time.perf_counter()
+        findings = self.map_segments(segments, question)
+        map_seconds = time.perf_counter() - start
+        answer = self.reduce(question, findings)
+        return LongVideoResult(answer, findings, map_seconds, time.perf_counter() - start - map_seconds)
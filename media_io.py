@@ -0,0 +1,71 @@
+import hashlib
+import os
+import tempfile
+from dataclasses import dataclass
+
+DEFAULT_CHUNK_SIZE = 1024 * 1024
+# Upper bound on the copy buffer, whatever chunk size is requested
+MAX_RESIDENT_BYTES = int(os.getenv("SPOOL_MAX_RESIDENT_BYTES", 8 * 1024 * 1024))
+
+
+@dataclass
+class SpoolResult:
+    path: str
+    sha256: str
+    size: int
+
+
+class SpoolWriter:
+    """Writes incoming chunks to a temp file, hashing and counting them as they arrive."""
+
+    def __init__(self, suffix="", dir=None):
+        self._file = tempfile.NamedTemporaryFile(delete=False, suffix=suffix, dir=dir)
+        self._digest = hashlib.sha256()
+        self.size = 0
+
+    def write(self, chunk):
+        self._digest.update(chunk)
+        self._file.write(chunk)
+        self.size += len(chunk)
+
+    def close(self):
+        self._file.close()
+        return SpoolResult(self._file.name, self._digest.hexdigest(), self.size)
+
+    def abort(self):
+        self._file.close()
+        os.unlink(self._file.name)
+
+
+def spool_upload(source, suffix="", dir=None, chunk_size=DEFAULT_CHUNK_SIZE,
+                 max_resident_bytes=MAX_RESIDENT_BYTES):
+    # Copy a file-like upload to disk through one reusable buffer, hashing and
+    # counting bytes in the same pass so the file is never read twice
+    buffer_size = max(1, min(chunk_size, max_resident_bytes))
+    buffer = bytearray(buffer_size)
+    view = memoryview(buffer)
+
+    if hasattr(source, "seek"):
+        source.seek(0)
+    readinto = getattr(source, "readinto", None)
+
+    spool = SpoolWriter(suffix=suffix, dir=dir)
+    try:
+        while True:
+            if readinto is not None:
+                n = readinto(view)
+                if not n:
+                    break
+                spool.write(view[:n])
+            else:
+                data = source.read(buffer_size)
+                if not data:
+                    break
+                spool.write(data)
+    except BaseException:
+        spool.abort()
+        raise
+
+    if hasattr(source, "seek"):
+        source.seek(0)
+    return spool.close()
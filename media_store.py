@@ -0,0 +1,213 @@
+import hashlib
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from media_io import SpoolWriter, spool_upload
+from metrics import span
+
+DEFAULT_ROOT = Path(tempfile.gettempdir()) / "multimodal_agent_media"
+DEFAULT_QUOTA_BYTES = int(os.getenv("MEDIA_STORE_QUOTA_BYTES", 10 * 1024 ** 3))
+# Sessions that have not rerun for this long are treated as closed
+DEFAULT_SESSION_IDLE_SECONDS = 60 * 60
+
+
+@dataclass
+class MediaRef:
+    path: str
+    sha256: str
+    size: int
+
+
+@dataclass
+class _Blob:
+    ref: MediaRef
+    refcount: int = 0
+    last_used: float = 0.0
+
+
+@dataclass
+class _Session:
+    # slot name -> (upload id, sha256)
+    slots: dict = field(default_factory=dict)
+    last_seen: float = 0.0
+
+
+class MediaStore:
+    """Content-addressed media files on local disk, shared across sessions.
+
+    Each session holds named slots ("video", ...) that point at one
+    upload. A file is written once per upload id, reused across reruns and
+    reference counted; unreferenced files stay around as a cache until the
+    disk quota forces least recently used ones out.
+    """
+
+    def __init__(self, root=DEFAULT_ROOT, quota_bytes=DEFAULT_QUOTA_BYTES,
+                 session_idle_seconds=DEFAULT_SESSION_IDLE_SECONDS, clock=time.time):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.quota_bytes = quota_bytes
+        self.session_idle_seconds = session_idle_seconds
+        self.clock = clock
+        self.total_bytes = 0
+        self.bytes_written = 0
+        self._blobs = OrderedDict()
+        self._sessions = {}
+        self._lock = threading.RLock()
+
+    def acquire(self, session_id, slot, upload_id, source, suffix=""):
+        # Returns the stored file for this upload, spooling it only the first time
+        with span("spool") as spool:
+            with self._lock:
+                ref = self._current(session_id, slot, upload_id)
+            spool.cache_hit = ref is not None
+            if ref is not None:
+                return ref
+            spooled = spool_upload(source, suffix=suffix, dir=self.root)
+            spool.bytes = spooled.size
+            return self.adopt(session_id, slot, upload_id, spooled, suffix)
+
+    def acquire_bytes(self, session_id, slot, upload_id, data, suffix=""):
+        with self._lock:
+            ref = self._current(session_id, slot, upload_id)
+            if ref is not None:
+                return ref
+        digest = hashlib.sha256(data).hexdigest()
+        with self._lock:
+            if digest in self._blobs:
+                # Same bytes are already stored (e.g. the spooled copy of this video); skip the write
+                return self._link(session_id, slot, upload_id, digest)
+        with tempfile.NamedTemporaryFile(delete=False, suffix=suffix, dir=self.root) as f:
+            f.write(data)
+        spooled = MediaRef(f.name, digest, len(data))
+        return self.adopt(session_id, slot, upload_id, spooled, suffix)
+
+    def add_cached_file(self, path, session_id=None, slot=None):
+        # Files derived from stored media (transcodes, segments) live under the same quota as a
+        # least-recently-used cache; calling again for the same path marks it used. With a session
+        # and slot the file is also held, like an upload, until that slot or session is released,
+        # so the quota can't delete it while it is still being read
+        path = str(path)
+        with self._lock:
+            blob = self._blobs.get(path)
+            if blob is None:
+                size = os.path.getsize(path)
+                blob = _Blob(MediaRef(path, None, size))
+                self._blobs[path] = blob
+                self.total_bytes += size
+            if session_id is not None:
+                return self._link(session_id, slot, path, path)
+            blob.last_used = self.clock()
+            self._blobs.move_to_end(path)
+            self._enforce_quota()
+            return blob.ref
+
+    def writer(self, suffix=""):
+        # For bodies that arrive in chunks; pass the closed writer's result to adopt()
+        return SpoolWriter(suffix=suffix, dir=self.root)
+
+    def release(self, session_id, slot):
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is None or slot not in session.slots:
+                return
+            _, sha = session.slots.pop(slot)
+            self._decref(sha)
+
+    def release_session(self, session_id):
+        with self._lock:
+            session = self._sessions.pop(session_id, None)
+            if session is None:
+                return
+            for _, sha in session.slots.values():
+                self._decref(sha)
+            self._enforce_quota()
+
+    def sweep_idle_sessions(self):
+        cutoff = self.clock() - self.session_idle_seconds
+        with self._lock:
+            idle = [sid for sid, s in self._sessions.items() if s.last_seen < cutoff]
+        for session_id in idle:
+            self.release_session(session_id)
+        return len(idle)
+
+    def get(self, sha256):
+        with self._lock:
+            blob = self._blobs.get(sha256)
+            return blob.ref if blob else None
+
+    def stats(self):
+        with self._lock:
+            return {
+                "files": len(self._blobs),
+                "sessions": len(self._sessions),
+                "total_bytes": self.total_bytes,
+                "bytes_written": self.bytes_written,
+            }
+
+    def _current(self, session_id, slot, upload_id):
+        session = self._sessions.setdefault(session_id, _Session())
+        session.last_seen = self.clock()
+        current = session.slots.get(slot)
+        if current is None:
+            return None
+        if current[0] == upload_id:
+            blob = self._blobs[current[1]]
+            blob.last_used = session.last_seen
+            self._blobs.move_to_end(current[1])
+            return blob.ref
+        # A different upload replaced this slot
+        del session.slots[slot]
+        self._decref(current[1])
+        return None
+
+    def adopt(self, session_id, slot, upload_id, spooled, suffix=""):
+        # Take ownership of a file spooled into self.root
+        with self._lock:
+            self.bytes_written += spooled.size
+            blob = self._blobs.get(spooled.sha256)
+            if blob is None:
+                path = self.root / f"{spooled.sha256}{suffix}"
+                os.replace(spooled.path, path)
+                blob = _Blob(MediaRef(str(path), spooled.sha256, spooled.size))
+                self._blobs[spooled.sha256] = blob
+                self.total_bytes += spooled.size
+            else:
+                # Same bytes are already stored for another upload
+                Path(spooled.path).unlink(missing_ok=True)
+            return self._link(session_id, slot, upload_id, spooled.sha256)
+
+    def _link(self, session_id, slot, upload_id, sha):
+        # Point the session's slot at a stored blob
+        blob = self._blobs[sha]
+        blob.refcount += 1
+        blob.last_used = self.clock()
+        self._blobs.move_to_end(sha)
+
+        session = self._sessions.setdefault(session_id, _Session())
+        session.last_seen = blob.last_used
+        previous = session.slots.get(slot)
+        session.slots[slot] = (upload_id, sha)
+        if previous is not None:
+            self._decref(previous[1])
+        self._enforce_quota()
+        return blob.ref
+
+    def _decref(self, sha):
+        blob = self._blobs.get(sha)
+        if blob is not None and blob.refcount > 0:
+            blob.refcount -= 1
+
+    def _enforce_quota(self):
+        if self.total_bytes <= self.quota_bytes:
+            return
+        for sha in [sha for sha, blob in self._blobs.items() if blob.refcount == 0]:
+            if self.total_bytes <= self.quota_bytes:
+                break
+            blob = self._blobs.pop(sha)
+            Path(blob.ref.path).unlink(missing_ok=True)
+            self.total_bytes -= blob.ref.size
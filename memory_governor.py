@@ -0,0 +1,248 @@
+import mmap
+import os
+import sys
+import threading
+import time
+import weakref
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from metrics import span
+
+# Memory all sessions together may pin before running sessions lose their image previews too
+CEILING_BYTES = int(os.getenv("SESSION_MEMORY_CEILING_BYTES", 2 * 1024 ** 3))
+# Smaller buffers aren't worth a file of their own
+SPILL_MIN_BYTES = int(os.getenv("SESSION_SPILL_MIN_BYTES", 1024 ** 2))
+# Sessions that have not run for this long are spilled; running ones never are
+IDLE_SECONDS = int(os.getenv("SESSION_MEMORY_IDLE_SECONDS", 5 * 60))
+
+
+def map_file(path):
+    # Read-only mapping: reads are served from the page cache, which the kernel can reclaim
+    # Python 3.13 can map without keeping a duplicate descriptor open per mapping
+    kwargs = {"trackfd": False} if sys.version_info >= (3, 13) else {}
+    with open(path, "rb") as f:
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ, **kwargs)
+
+
+def resident_bytes(data):
+    # Mapped buffers are backed by their file, not by the Python heap
+    return 0 if isinstance(data, mmap.mmap) else len(data)
+
+
+def copied_bytes(uploaded):
+    # UploadedFile is a BytesIO: it shares a bytes buffer but makes a private copy of a mapped one
+    if uploaded is None or uploaded.closed:
+        return 0
+    with uploaded.getbuffer() as view:
+        return view.nbytes
+
+
+class StreamlitUploads:
+    """The uploaded files Streamlit's in-memory upload manager keeps for each session."""
+
+    def __init__(self, manager):
+        self.manager = manager
+
+    def records(self):
+        # (session id, file id, file name, data) for every stored upload
+        storage = getattr(self.manager, "file_storage", {})
+        for session_id, files in list(storage.items()):
+            for file_id, rec in list(files.items()):
+                yield session_id, file_id, rec.name, rec.data
+
+    def replace(self, session_id, file_id, data):
+        files = self.manager.file_storage.get(session_id)
+        rec = files.get(file_id) if files else None
+        if rec is not None:
+            files[file_id] = rec._replace(data=data)
+
+
+@dataclass
+class _Session:
+    last_seen: float = 0.0
+    # Weak references to this run's UploadedFile objects, closed once their buffers are spilled
+    files: list = field(default_factory=list)
+    # ImageRenditions the session shows; their previews can be dropped and decoded again
+    derived: list = field(default_factory=list)
+
+
+class SessionMemoryGovernor:
+    """Keeps the memory that open sessions pin under a ceiling.
+
+    Streamlit holds every uploaded file as bytes for as long as its tab is
+    open. Buffers of sessions that go idle are written to the media store
+    and swapped for a read-only memory map of that file, and their image
+    previews are dropped. Running sessions are never spilled: each rerun
+    would copy a mapped upload into a fresh UploadedFile. A spilled session
+    that runs again gets its uploads loaded back once, and until then the
+    copies its runs made are counted. Over the ceiling, running sessions
+    lose their previews as well, least recently seen first; those are
+    decoded again from the model JPEG when needed.
+    """
+
+    def __init__(self, media_store, uploads, ceiling_bytes=CEILING_BYTES, spill_min_bytes=SPILL_MIN_BYTES,
+                 idle_seconds=IDLE_SECONDS, is_active=None, clock=time.time):
+        self.media_store = media_store
+        self.uploads = uploads
+        self.ceiling_bytes = ceiling_bytes
+        self.spill_min_bytes = spill_min_bytes
+        self.idle_seconds = idle_seconds
+        # Optional session id -> bool, so closed sessions release their spilled files
+        self.is_active = is_active
+        self.clock = clock
+        self.spills = 0
+        self.spilled_bytes = 0
+        self.restores = 0
+        self.dropped_bytes = 0
+        self._sessions = {}
+        # (session id, file id) pairs whose buffer lives in the media store
+        self._spilled = set()
+        self._lock = threading.Lock()
+
+    def touch(self, session_id, files=None, derived=None):
+        # Called from each run; files/derived replace what the session was holding before
+        with self._lock:
+            session = self._sessions.setdefault(session_id, _Session())
+            session.last_seen = self.clock()
+            if files is not None:
+                session.files = [weakref.ref(f) for f in files if f is not None]
+            if derived is not None:
+                session.derived = list(derived)
+
+    def usage(self):
+        # {session id: bytes held in memory}; a preview shown by several sessions counts in each
+        usage = {}
+        mapped = set()
+        for session_id, _, _, data in self.uploads.records():
+            usage[session_id] = usage.get(session_id, 0) + resident_bytes(data)
+            if isinstance(data, mmap.mmap):
+                mapped.add(session_id)
+        with self._lock:
+            for session_id, session in self._sessions.items():
+                held = sum(r.preview_bytes for r in session.derived)
+                if session_id in mapped:
+                    held += sum(copied_bytes(ref()) for ref in session.files)
+                usage[session_id] = usage.get(session_id, 0) + held
+        return usage
+
+    def enforce(self):
+        # One pass: load back sessions that run again, spill idle ones, then drop previews of
+        # least recently seen running ones until under the ceiling
+        with span("memory_governor") as enforce:
+            closed = self._forget_closed()
+            now = self.clock()
+            with self._lock:
+                sessions = dict(self._sessions)
+            idle = {sid for sid, s in sessions.items() if now - s.last_seen >= self.idle_seconds}
+            buffers = {}
+            for session_id, file_id, name, data in self.uploads.records():
+                if session_id in closed:
+                    continue
+                # Uploads of sessions that never ran since the governor started count as idle
+                if session_id not in sessions:
+                    idle.add(session_id)
+                if session_id not in idle and isinstance(data, mmap.mmap):
+                    self._restore(session_id, file_id, data)
+                elif session_id in idle and resident_bytes(data) >= self.spill_min_bytes:
+                    buffers.setdefault(session_id, []).append((file_id, name, data))
+            usage = {sid: held for sid, held in self.usage().items() if sid not in closed}
+            total = sum(usage.values())
+            # Previews that running sessions are showing are only dropped under pressure
+            in_use = {id(r) for sid, s in sessions.items() if sid not in idle for r in s.derived}
+
+            freed = 0
+            for session_id in sorted(usage, key=lambda sid: self._last_seen(sessions, sid)):
+                pressure = total - freed > self.ceiling_bytes
+                session = sessions.get(session_id)
+                if session_id in idle:
+                    freed += self._evict(session_id, session, buffers.get(session_id, ()),
+                                         keep=set() if pressure else in_use)
+                elif pressure and session is not None:
+                    freed += self._drop_previews(session, keep=set())
+            enforce.bytes = freed
+            return freed
+
+    def stats(self):
+        usage = self.usage()
+        return {
+            "sessions": len(usage),
+            "resident_bytes": sum(usage.values()),
+            "ceiling_bytes": self.ceiling_bytes,
+            "spills": self.spills,
+            "spilled_bytes": self.spilled_bytes,
+            "restores": self.restores,
+            "dropped_bytes": self.dropped_bytes,
+        }
+
+    def forget(self, session_id):
+        with self._lock:
+            self._sessions.pop(session_id, None)
+            spilled = [key for key in self._spilled if key[0] == session_id]
+            self._spilled.difference_update(spilled)
+        self.media_store.release_session(session_id)
+
+    def _last_seen(self, sessions, session_id):
+        session = sessions.get(session_id)
+        return session.last_seen if session is not None else 0.0
+
+    def _evict(self, session_id, session, buffers, keep):
+        freed = 0
+        for file_id, name, data in buffers:
+            freed += self._spill(session_id, file_id, name, data)
+        if session is None:
+            return freed
+        freed += self._drop_previews(session, keep)
+        # Outside a run nothing reads this run's UploadedFile copies, and the next run gets fresh ones
+        for ref in session.files:
+            uploaded = ref()
+            if uploaded is None:
+                continue
+            try:
+                uploaded.close()
+            except BufferError:
+                # A memoryview of it is still alive; it goes with the session
+                pass
+        session.files = []
+        return freed
+
+    def _drop_previews(self, session, keep):
+        freed = 0
+        for renditions in session.derived:
+            if id(renditions) not in keep:
+                released = renditions.drop_preview()
+                self.dropped_bytes += released
+                freed += released
+        return freed
+
+    def _spill(self, session_id, file_id, name, data):
+        ref = self.media_store.acquire_bytes(session_id, f"upload:{file_id}", file_id, data, Path(name).suffix)
+        self.uploads.replace(session_id, file_id, map_file(ref.path))
+        with self._lock:
+            self._spilled.add((session_id, file_id))
+        self.spills += 1
+        self.spilled_bytes += len(data)
+        return len(data)
+
+    def _restore(self, session_id, file_id, data):
+        # The session runs again: one copy back into memory, which its reruns then share
+        self.uploads.replace(session_id, file_id, bytes(data))
+        with self._lock:
+            self._spilled.discard((session_id, file_id))
+        self.media_store.release(session_id, f"upload:{file_id}")
+        self.restores += 1
+
+    def _forget_closed(self):
+        # Release the media store slots of uploads that are gone; returns the closed sessions
+        present = {(session_id, file_id) for session_id, file_id, _, _ in self.uploads.records()}
+        with self._lock:
+            gone = self._spilled - present
+            self._spilled -= gone
+            known = set(self._sessions) | {session_id for session_id, _ in present}
+        for session_id, file_id in gone:
+            self.media_store.release(session_id, f"upload:{file_id}")
+        # Streamlit drops a closed session's uploads shortly after; don't spill them in the meantime
+        closed = {sid for sid in known if self.is_active is not None and not self.is_active(sid)}
+        for session_id in closed:
+            self.forget(session_id)
+        return closed
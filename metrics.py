@@ -0,0 +1,221 @@
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    inner = ",".join(f'{key}="{str(value)}"' for key, value in sorted(labels.items()))
+    return "{" + inner + "}"
+
+
+class Histogram:
+    def __init__(self, name, help, buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.buckets = buckets
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * len(self.buckets), 0, 0.0]
+            counts = series[0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+            series[1] += 1
+            series[2] += value
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, (counts, count, total) in sorted(self._series.items()):
+                labels = dict(key)
+                for bound, bucket_count in zip(self.buckets, counts):
+                    lines.append(f"{self.name}_bucket{_format_labels({**labels, 'le': bound})} {bucket_count}")
+                lines.append(f"{self.name}_bucket{_format_labels({**labels, 'le': '+Inf'})} {count}")
+                lines.append(f"{self.name}_sum{_format_labels(labels)} {total}")
+                lines.append(f"{self.name}_count{_format_labels(labels)} {count}")
+        return lines
+
+
+class Counter:
+    def __init__(self, name, help):
+        self.name = name
+        self.help = help
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(dict(key))} {value}")
+        return lines
+
+
+class GaugeCallback:
+    # fn() returns a number, or a {label value: number} dict for a single `label`
+    def __init__(self, name, help, fn, label=None):
+        self.name = name
+        self.help = help
+        self.fn = fn
+        self.label = label
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} gauge"]
+        try:
+            value = self.fn()
+        except Exception:
+            return lines
+        if isinstance(value, dict):
+            for label_value, number in sorted(value.items()):
+                lines.append(f"{self.name}{_format_labels({self.label: label_value})} {number}")
+        else:
+            lines.append(f"{self.name} {value}")
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def histogram(self, name, help, buckets=LATENCY_BUCKETS):
+        return self._get(name, lambda: Histogram(name, help, buckets))
+
+    def counter(self, name, help):
+        return self._get(name, lambda: Counter(name, help))
+
+    def gauge(self, name, help, fn, label=None):
+        # Re-registering replaces the callback, so Streamlit reruns don't pile up stale ones
+        with self._lock:
+            self._metrics[name] = GaugeCallback(name, help, fn, label)
+
+    def render(self):
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+    def _get(self, name, factory):
+        with self._lock:
+            if name not in self._metrics:
+                self._metrics[name] = factory()
+            return self._metrics[name]
+
+
+REGISTRY = MetricsRegistry()
+STAGE_SECONDS = REGISTRY.histogram("multimodal_stage_seconds", "Time spent per pipeline stage")
+STAGE_BYTES = REGISTRY.counter("multimodal_stage_bytes_total", "Bytes processed per pipeline stage")
+CACHE_LOOKUPS = REGISTRY.counter("multimodal_cache_lookups_total", "Cache lookups per stage by result")
+
+
+@dataclass
+class Span:
+    stage: str
+    seconds: float = 0.0
+    bytes: int = None
+    cache_hit: bool = None
+    attrs: dict = field(default_factory=dict)
+
+
+class Trace:
+    """Spans recorded for one request, shown in the app's debug panel."""
+
+    def __init__(self):
+        self.spans = []
+        self._lock = threading.Lock()
+
+    def add(self, span):
+        with self._lock:
+            self.spans.append(span)
+
+    def rows(self):
+        with self._lock:
+            return [
+                {"stage": s.stage, "ms": round(s.seconds * 1000, 1), "bytes": s.bytes, "cache_hit": s.cache_hit, **s.attrs}
+                for s in self.spans
+            ]
+
+
+_current_trace = contextvars.ContextVar("multimodal_trace", default=None)
+
+
+@contextmanager
+def trace_context(trace):
+    token = _current_trace.set(trace)
+    try:
+        yield trace
+    finally:
+        _current_trace.reset(token)
+
+
+def current_trace():
+    return _current_trace.get()
+
+
+def set_trace(trace):
+    # For long-lived threads such as a Streamlit script run, where a with-block doesn't fit
+    _current_trace.set(trace)
+
+
+def record(stage, seconds, bytes=None, cache_hit=None, **attrs):
+    STAGE_SECONDS.observe(seconds, stage=stage)
+    if bytes:
+        STAGE_BYTES.inc(bytes, stage=stage)
+    if cache_hit is not None:
+        CACHE_LOOKUPS.inc(stage=stage, result="hit" if cache_hit else "miss")
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.add(Span(stage, seconds, bytes, cache_hit, attrs))
+
+
+@contextmanager
+def span(stage, bytes=None, cache_hit=None, **attrs):
+    # The yielded Span can be filled in (bytes, cache_hit, attrs) before the block ends
+    current = Span(stage, 0.0, bytes, cache_hit, attrs)
+    start = time.perf_counter()
+    try:
+        yield current
+    finally:
+        record(stage, time.perf_counter() - start, current.bytes, current.cache_hit, **current.attrs)
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = REGISTRY.render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_metrics_server(port, host="0.0.0.0"):
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    threading.Thread(target=server.serve_forever, name="metrics-server", daemon=True).start()
+    return server
@@ -1,13 +1,32 @@
 import streamlit as st
-from phi.agent import Agent
-from phi.model.google import Gemini
-from phi.tools.duckduckgo import DuckDuckGo
-from google.generativeai import upload_file, get_file
-import time
+from analysis_core import AgentPool, AnalysisCore, build_agent
+from conversation import HISTORY_TURNS, Conversation, GeminiContextCache
+from search_cache import SearchCache
+from file_registry import FileRegistry, GeminiFileBackend
+from governor import GovernedFileBackend, Governor, friendly_error
+from file_poller import FilePoller
+from streaming import render_stream
+from response_cache import ResponseCache
+from media_store import MediaStore
+from memory_governor import SessionMemoryGovernor, StreamlitUploads
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+from image_pipeline import ImagePipeline
+from image_batches import analyze_images
+from history_store import HistoryStore, make_thumbnail
+from hash_index import NearDuplicateIndex
 from pathlib import Path
-import tempfile
+from transcode import Transcoder
+from jobs import JobLimitError, JobQueue
+from metrics import REGISTRY, Trace, record, set_trace, span, start_metrics_server
+from concurrent.futures import ThreadPoolExecutor
+import hashlib
 import os
-from PIL import Image
+import threading
+import time
+
+# Heavy modules (phi, google.generativeai, duckduckgo_search, Pillow, numpy, imageio_ffmpeg)
+# are imported where they are first needed, so the page paints before they load.
+# Check with: python benchmarks/profile_imports.py
 
 st.set_page_config(
     page_title="Multimodal AI Agent",
@@ -17,80 +36,476 @@ st.set_page_config(
 
 st.title("Multimodal AI Agent 🧬")
 
-# Initialize single agent with both capabilities
+# Stages timed on the script thread during this run, for the debug panel
+ui_trace = Trace()
+set_trace(ui_trace)
+
+# Web searches shared by every session, so repeated topics don't hit DuckDuckGo again
+@st.cache_resource
+def initialize_search_cache():
+    return SearchCache()
+
+search_cache = initialize_search_cache()
+
+# Agents with both capabilities, one per model call in flight since a phi Agent can't run two
+# at once. The first is built off the script thread so the uploaders render while phi is still
+# importing; the first model call waits on it
+@st.cache_resource
+def initialize_agents():
+    builder = ThreadPoolExecutor(max_workers=1, thread_name_prefix="agent-build")
+    first = builder.submit(build_agent, search_cache)
+    builder.shutdown(wait=False)
+    return AgentPool(lambda: build_agent(search_cache), first=first)
+
+agents = initialize_agents()
+
+# Shared rate/concurrency control for all Gemini calls made by every session
+@st.cache_resource
+def initialize_governor():
+    return Governor()
+
+governor = initialize_governor()
+
+# Videos already uploaded to Gemini, shared across sessions so repeat questions skip the upload
+@st.cache_resource
+def initialize_file_registry():
+    return FileRegistry(GovernedFileBackend(GeminiFileBackend(), governor))
+
+file_registry = initialize_file_registry()
+
+# One background thread watches every video that Gemini is still processing
+@st.cache_resource
+def initialize_file_poller():
+    return FilePoller(file_registry.backend.get)
+
+file_poller = initialize_file_poller()
+
+# Uploaded media on local disk, written once per upload and reused across reruns
+@st.cache_resource
+def initialize_media_store():
+    return MediaStore()
+
+media_store = initialize_media_store()
+media_store.sweep_idle_sessions()
+
+# Downscales oversized videos with ffmpeg before they are uploaded
 @st.cache_resource
-def initialize_agent():
-    return Agent(
-        name="Multimodal Analyst",
-        model=Gemini(id="gemini-2.0-flash-exp"),
-        tools=[DuckDuckGo()],
-        markdown=True,
+def initialize_transcoder():
+    return Transcoder(media_store.root / "transcoded", media_store=media_store)
+
+transcoder = initialize_transcoder()
+session_id = get_script_run_ctx().session_id
+
+# Answers to questions already asked about the same media
+@st.cache_resource
+def initialize_response_cache():
+    return ResponseCache()
+
+response_cache = initialize_response_cache()
+
+# Preview and model-input renditions of uploaded images, reused across reruns
+@st.cache_resource
+def initialize_image_pipeline():
+    return ImagePipeline()
+
+image_pipeline = initialize_image_pipeline()
+
+# Perceptual hashes of analyzed images, so a re-saved or cropped copy reuses earlier answers.
+# The index is plain Python; numpy and Pillow load with the first image that gets hashed.
+@st.cache_resource
+def initialize_near_duplicates():
+    return NearDuplicateIndex()
+
+near_duplicates = initialize_near_duplicates()
+
+# Every answer with its prompt and timings, searchable from the sidebar
+@st.cache_resource
+def initialize_history():
+    return HistoryStore()
+
+history = initialize_history()
+
+core = AnalysisCore(agents, file_registry, file_poller, transcoder, image_pipeline, response_cache, governor,
+                    near_duplicates=near_duplicates, history=history)
+
+# Analyses run here instead of in the script thread, so reruns don't throw the work away
+@st.cache_resource
+def initialize_job_queue():
+    return JobQueue(
+        max_workers=int(os.getenv("ANALYSIS_WORKERS", 8)),
+        per_owner_limit=int(os.getenv("ANALYSIS_JOBS_PER_SESSION", 2)),
     )
 
-agent = initialize_agent()
+job_queue = initialize_job_queue()
+
+# Unsubscribe sessions that have gone away from their jobs; shared jobs keep running for the rest
+@st.cache_resource
+def initialize_job_reaper(interval=30):
+    from streamlit.runtime import Runtime
+
+    runtime = Runtime.instance()
+
+    def reap():
+        while True:
+            time.sleep(interval)
+            for owner in job_queue.owners():
+                if not runtime.is_active_session(owner):
+                    job_queue.cancel_owner(owner)
+
+    thread = threading.Thread(target=reap, name="job-reaper", daemon=True)
+    thread.start()
+    return thread
+
+initialize_job_reaper()
+
+# Spills uploads of idle or oversized sessions to the media store and drops their image previews,
+# keeping what open tabs pin in memory under SESSION_MEMORY_CEILING_BYTES
+@st.cache_resource
+def initialize_memory_governor(interval=10):
+    from streamlit.runtime import Runtime
+
+    runtime = Runtime.instance()
+    memory_governor = SessionMemoryGovernor(
+        media_store, StreamlitUploads(runtime.uploaded_file_mgr), is_active=runtime.is_active_session
+    )
+
+    def enforce():
+        while True:
+            time.sleep(interval)
+            memory_governor.enforce()
+
+    threading.Thread(target=enforce, name="memory-governor", daemon=True).start()
+    return memory_governor
+
+memory_governor = initialize_memory_governor()
+
+# Prometheus text endpoint, served from a side thread when METRICS_PORT is set
+@st.cache_resource
+def initialize_metrics():
+    REGISTRY.gauge("multimodal_jobs", "Analysis jobs by status", job_queue.stats, label="status")
+    REGISTRY.gauge("multimodal_jobs_coalesced", "Submissions that joined an identical running job",
+                   lambda: job_queue.coalesced)
+    REGISTRY.gauge("multimodal_governor", "Gemini call governor state", governor.stats, label="metric")
+    REGISTRY.gauge("multimodal_agents", "Pooled agents", agents.stats, label="metric")
+    REGISTRY.gauge("multimodal_response_cache", "Response cache counters", response_cache.stats, label="metric")
+    REGISTRY.gauge("multimodal_search_cache", "Search cache counters", search_cache.stats, label="metric")
+    REGISTRY.gauge("multimodal_media_store", "Media store usage", media_store.stats, label="metric")
+    REGISTRY.gauge("multimodal_history", "Analysis history store", history.stats, label="metric")
+    REGISTRY.gauge("multimodal_near_duplicates", "Perceptual hash index", near_duplicates.stats, label="metric")
+    REGISTRY.gauge("multimodal_memory_governor", "Session memory governor", memory_governor.stats, label="metric")
+    REGISTRY.gauge("multimodal_session_memory_bytes", "Uploads and image previews each session holds in memory",
+                   memory_governor.usage, label="session")
+    if os.getenv("METRICS_PORT"):
+        return start_metrics_server(int(os.getenv("METRICS_PORT")))
+
+initialize_metrics()
+
+stream_responses = st.sidebar.toggle("Stream responses", value=True)
+show_timings = st.sidebar.toggle("Show timing breakdown", help="Per-stage latency of the current request")
+keyframe_mode = st.sidebar.toggle(
+    "Keyframe mode",
+    help="Send one frame per scene instead of the whole video. Best for lectures, slides and whiteboards.",
+)
+
+long_video_mode = st.sidebar.toggle(
+    "Long video mode",
+    help="Split the video into segments that are analyzed in parallel, then merge the findings.",
+)
+segment_minutes = st.sidebar.slider("Segment length (minutes)", 2, 30, 10, disabled=not long_video_mode)
+conversation_mode = st.sidebar.toggle(
+    "Conversation mode",
+    help="Ask follow-up questions about the same video. Later questions reuse the uploaded file "
+         "and, where Gemini supports it, a cached copy of the video context.",
+)
+
+# Scene keyframes per video, so several questions about the same clip decode it once
+@st.cache_data(max_entries=16, show_spinner=False)
+def cached_keyframes(video_path, video_digest):
+    from keyframes import extract_keyframes
+    return extract_keyframes(video_path)
+
+def analysis_job(job, cache_key, run, entry):
+    # Runs on a job worker: no st.* calls in here, progress goes through the job
+    streamed = render_stream(job.watch(run(job, stream=True)), job)
+    record("first_token", streamed.time_to_first_token)
+    record("generate", streamed.total_time, bytes=len(streamed.content.encode("utf-8")))
+    response_cache.put(cache_key, streamed.content)
+    core.record_history(answer=streamed.content, seconds=streamed.total_time, timings=job.trace.rows(), **entry)
+    job.note(f"First token after {streamed.time_to_first_token:.1f}s, done in {streamed.total_time:.1f}s")
+    return streamed.content
+
+def start_analysis(media_hash, question, status_text, run, variant="", kind="video", thumbnail=None):
+    # Serve repeated (media, question) pairs from the cache, otherwise queue a job and remember its id
+    cache_key = core.cache_key(media_hash, question, variant)
+    with span("response_cache") as lookup:
+        cached = response_cache.get(cache_key)
+        lookup.cache_hit = cached is not None
+    if cached is not None:
+        st.session_state["analysis"] = {"media": media_hash, "cached": cached}
+        return
+    try:
+        # Identical in-flight analyses from other sessions are joined rather than run twice
+        entry = dict(media_hash=media_hash, kind=kind, prompt=question, thumbnail=thumbnail, owner=session_id)
+        job = job_queue.submit(session_id, status_text, analysis_job, cache_key, run, entry, coalesce_key=cache_key)
+    except JobLimitError as e:
+        st.warning(str(e))
+        return
+    st.session_state["analysis"] = {
+        "media": media_hash,
+        "job_id": job.id,
+        # Lets a failed analysis be retried without retyping the question
+        "resubmit": lambda: start_analysis(media_hash, question, status_text, run, variant, kind, thumbnail),
+    }
+
+def show_analysis(media_hash):
+    analysis = st.session_state.get("analysis")
+    if analysis is None or analysis["media"] != media_hash:
+        return
+    if "cached" in analysis:
+        st.markdown(analysis["cached"])
+        st.caption("Answered from cache")
+        return
+    if analysis.get("cancelled"):
+        st.warning("Analysis cancelled.")
+        return
+    job = job_queue.get(analysis["job_id"])
+    if job is None:
+        st.session_state.pop("analysis")
+        return
+
+    # Only poll while the job is running; the fragment reruns on its own without rerunning the page
+    polling = not job.finished
+
+    @st.fragment(run_every=1.0 if polling else None)
+    def job_status():
+        # Fragment reruns skip the top of the script; a session watching its job isn't idle
+        memory_governor.touch(session_id)
+        if not job.finished:
+            st.info(f"{job.label} ({time.time() - job.created_at:.0f}s)")
+            if len(job.owners) > 1:
+                st.caption(f"Shared with {len(job.owners) - 1} other session(s) asking the same question")
+            if st.button("Cancel", key=f"cancel-{job.id}"):
+                # A job shared with other sessions keeps running for them; this session stops waiting either way
+                job_queue.cancel(job.id, session_id)
+                st.session_state["analysis"] = {"media": media_hash, "cancelled": True}
+                st.rerun()
+            if stream_responses and job.partial:
+                st.markdown(job.partial)
+            for note in job.notes:
+                st.caption(note)
+            return
+        if job.status == "done":
+            with span("render", bytes=len(job.result)):
+                st.markdown(job.result)
+        elif job.status == "cancelled":
+            st.warning("Analysis cancelled.")
+        else:
+            st.error(friendly_error(job.error))
+            if st.button("Try again", key=f"retry-{job.id}"):
+                analysis["resubmit"]()
+                st.rerun()
+        for note in job.notes:
+            st.caption(note)
+        if show_timings:
+            st.dataframe(job.trace.rows() + ui_trace.rows(), use_container_width=True)
+        if polling:
+            # Leave polling mode by rerunning the whole page once
+            st.rerun()
+
+    job_status()
+
+def start_turn(conversation, media, question):
+    # False if the job queue turned the question away. A follow-up's answer depends on the turns before it, so the cache key covers the conversation so far
+    cache_key = core.cache_key(conversation.digest, question, conversation.cache_variant())
+    with span("response_cache") as lookup:
+        cached = response_cache.get(cache_key)
+        lookup.cache_hit = cached is not None
+    if cached is not None:
+        conversation.add_cached_turn(question, cached)
+        return True
+    run = lambda job, **run_kwargs: conversation.ask(question, note=job.note)
+    try:
+        # Not coalesced: the turn belongs to this session's conversation
+        entry = dict(media_hash=conversation.digest, kind="conversation", prompt=question, owner=session_id)
+        job = job_queue.submit(session_id, "Thinking...", analysis_job, cache_key, run, entry)
+    except JobLimitError as e:
+        st.warning(str(e))
+        return False
+    st.session_state["analysis"] = {
+        "media": media,
+        "job_id": job.id,
+        "question": question,
+        "resubmit": lambda: start_turn(conversation, media, question),
+    }
+    return True
+
+# Past answers, found by words in the question or the answer, without paying for a new analysis
+with st.sidebar.expander("Search past analyses"):
+    history_query = st.text_input("Search", placeholder="e.g. beam diagram", label_visibility="collapsed")
+    # Other users' prompts and answers stay out of view unless asked for
+    all_sessions = st.checkbox("All sessions", help="Include analyses run by other sessions of this app")
+    started = time.perf_counter()
+    hits = history.search(history_query, limit=10, owner=None if all_sessions else session_id)
+    st.caption(f"{len(hits)} results in {(time.perf_counter() - started) * 1000:.0f} ms")
+    for hit in hits:
+        if hit.thumbnail:
+            st.image(hit.thumbnail, width=64)
+        st.markdown(f"**{hit.prompt}**  \n{hit.snippet}")
+        when = time.strftime("%Y-%m-%d %H:%M", time.localtime(hit.created_at))
+        if st.toggle(f"{when} · {hit.kind} · show full answer", key=f"history-{hit.id}"):
+            st.markdown(history.answer(hit.id)[0])
+        st.divider()
 
 # File uploader for both video and image (including jfif)
 uploaded_video = st.file_uploader("Upload a video file", type=['mp4', 'mov', 'avi'])
-uploaded_image = st.file_uploader("Upload an image", type=["jpg", "jpeg", "png", "jfif"])
-
-# Function to resize images using Pillow
-def resize_image(image_data, max_width=500, max_height=300):
-    image = Image.open(image_data)
-    image.thumbnail((max_width, max_height))  # Resize the image while maintaining aspect ratio
-    return image
+uploaded_images = st.file_uploader("Upload images", type=["jpg", "jpeg", "png", "jfif"], accept_multiple_files=True)
+uploaded_image = uploaded_images[0] if len(uploaded_images) == 1 else None
+memory_governor.touch(session_id, files=[uploaded_video, *uploaded_images], derived=[])
 
 if uploaded_video:
-    with tempfile.NamedTemporaryFile(delete=False, suffix='.mp4') as tmp_file:
-        tmp_file.write(uploaded_video.read())
-        video_path = tmp_file.name
+    # Only the first run for this upload copies it to disk; reruns reuse the stored file
+    stored_video = media_store.acquire(session_id, "video", uploaded_video.file_id, uploaded_video, suffix='.mp4')
+    video_path = stored_video.path
     
     st.video(video_path)
     
-    user_prompt = st.text_area(
-        "What would you like to know about the video?",
-        placeholder="Ask any question related to the video - the AI Agent will analyze it and search the web if needed",
-        help="You can ask questions about the video content and get relevant information from the web"
-    )
+    if conversation_mode:
+        # One conversation per session, restarted whenever a different video is uploaded
+        conversation = st.session_state.get("conversation")
+        if conversation is None or conversation.digest != stored_video.sha256:
+            if conversation is not None:
+                conversation.close()
+            conversation = Conversation(
+                core, video_path, stored_video.sha256,
+                lambda: build_agent(search_cache, history_turns=HISTORY_TURNS),
+                GeminiContextCache(core.model_id),
+            )
+            st.session_state["conversation"] = conversation
+
+        # The turn in progress runs as a job, so widget reruns don't lose it
+        conversation_media = f"{stored_video.sha256}:conversation"
+        pending = st.session_state.get("analysis")
+        pending = pending if pending is not None and pending["media"] == conversation_media else None
+        turn_job = job_queue.get(pending["job_id"]) if pending is not None and "job_id" in pending else None
+        if pending is not None and "job_id" in pending and (turn_job is None or turn_job.status == "done"):
+            # An answered turn is listed with the others from now on
+            st.session_state.pop("analysis")
+            pending = turn_job = None
+
+        for turn in conversation.turns:
+            with st.chat_message("user"):
+                st.markdown(turn.question)
+            with st.chat_message("assistant"):
+                st.markdown(turn.answer)
+                st.caption(turn.summary())
+
+        if pending is not None:
+            if "question" in pending:
+                with st.chat_message("user"):
+                    st.markdown(pending["question"])
+            with st.chat_message("assistant"):
+                show_analysis(conversation_media)
+
+        # One turn at a time: each follow-up builds on the answer before it
+        waiting = turn_job is not None and not turn_job.finished
+        question = st.chat_input("Ask about the video", disabled=waiting)
+        if question and start_turn(conversation, conversation_media, question):
+            st.rerun()
+        if conversation.mode == "history" and conversation.fallback_reason:
+            st.caption("Context caching is unavailable for this video, so each follow-up re-sends it.")
+        if conversation.turns and st.button("New conversation", disabled=waiting):
+            st.session_state.pop("analysis", None)
+            conversation.close()
+            st.session_state.pop("conversation")
+            st.rerun()
+        if show_timings:
+            st.dataframe(ui_trace.rows(), use_container_width=True)
+    else:
+        user_prompt = st.text_area(
+            "What would you like to know about the video?",
+            placeholder="Ask any question related to the video - the AI Agent will analyze it and search the web if needed",
+            help="You can ask questions about the video content and get relevant information from the web"
+        )
     
-    if st.button("Analyze & Research Video"):
-        if not user_prompt:
-            st.warning("Please enter your question.")
-        else:
-            try:
-                with st.spinner("Processing video and researching..."):
-                    video_file = upload_file(video_path)
-                    while video_file.state.name == "PROCESSING":
-                        time.sleep(2)
-                        video_file = get_file(video_file.name)
-
-                    prompt = f"""
-                    First analyze this video and then answer the following question using both 
-                    the video analysis and web research: {user_prompt}
-                    
-                    Provide a comprehensive response focusing on practical, actionable information.
-                    """
-                    
-                    result = agent.run(prompt, videos=[video_file])
-                    
-                st.subheader("Result")
-                st.markdown(result.content)
-
-            except Exception as e:
-                st.error(f"An error occurred: {str(e)}")
-            finally:
-                Path(video_path).unlink(missing_ok=True)
+        if st.button("Analyze & Research Video"):
+            if not user_prompt:
+                st.warning("Please enter your question.")
+            else:
+                def run_keyframe_analysis(job, **run_kwargs):
+                    from keyframes import keyframe_prompt
+                    keyframes = cached_keyframes(video_path, stored_video.sha256)
+                    if not keyframes.keyframes:
+                        raise ValueError("No frames could be decoded from this video.")
+                    job.note(
+                        f"Keyframe mode: {len(keyframes.keyframes)} frames, "
+                        f"{keyframes.payload_bytes / 2**20:.1f} MiB instead of {keyframes.source_bytes / 2**20:.1f} MiB "
+                        f"({keyframes.saved_ratio:.0%} smaller)"
+                    )
+                    images = [frame.jpeg for frame in keyframes.keyframes]
+                    return core.run_agent(keyframe_prompt(keyframes, user_prompt), images=images, **run_kwargs)
+
+                def upload_segment(segment):
+                    segment_digest = f"{stored_video.sha256}:{segment.start:.0f}-{segment.end:.0f}"
+                    segment_file = file_registry.get_or_upload(segment.path, segment_digest)
+                    segment_file = file_poller.submit(segment_file, Path(segment.path).stat().st_size).result()
+                    file_registry.mark(segment_digest, segment_file)
+                    return segment_file
+
+                def analyze_segment(segment_file, segment, question):
+                    from long_video import segment_prompt
+                    return core.run_agent(segment_prompt(segment, question), videos=[segment_file]).content
+
+                def run_long_video_analysis(job, **run_kwargs):
+                    from long_video import MapReduceAnalyzer, reduce_prompt, split_video
+                    # Segment files are a cache under the media store's disk quota, held by this job
+                    # until its uploads are done so the quota can't delete one before it is sent
+                    keep = lambda path: media_store.add_cached_file(path, job.id, Path(path).name)
+                    try:
+                        segments = split_video(
+                            video_path, media_store.root / "segments", stored_video.sha256, segment_minutes * 60, keep
+                        )
+                        job.check_cancelled()
+                        reduce = lambda question, findings: core.run_agent(reduce_prompt(question, findings), **run_kwargs)
+                        result = MapReduceAnalyzer(upload_segment, analyze_segment, reduce).run(segments, user_prompt)
+                    finally:
+                        media_store.release_session(job.id)
+                    job.note(
+                        f"Analyzed {len(result.findings)} segments in {result.map_seconds:.0f}s; "
+                        f"slowest took {max(f.seconds for f in result.findings):.0f}s"
+                    )
+                    return result.answer
+
+                def run_video_analysis(job, **run_kwargs):
+                    return core.run_video(video_path, stored_video.sha256, user_prompt, note=job.note, **run_kwargs)
+
+                if long_video_mode:
+                    start_analysis(stored_video.sha256, user_prompt, "Analyzing video segments in parallel...",
+                                   run_long_video_analysis, variant=f":segments{segment_minutes}")
+                elif keyframe_mode:
+                    start_analysis(stored_video.sha256, user_prompt, "Extracting keyframes and researching...",
+                                   run_keyframe_analysis, variant=":keyframes")
+                else:
+                    start_analysis(stored_video.sha256, user_prompt, "Processing video and researching...", run_video_analysis)
+
+        if st.session_state.get("analysis", {}).get("media") == stored_video.sha256:
+            st.subheader("Result")
+            show_analysis(stored_video.sha256)
 
 elif uploaded_image:
+    media_store.release(session_id, "video")
     try:
-        # Resize image before displaying and analyzing
-        image_data = uploaded_image
-        resized_image = resize_image(image_data)
-
-        # Convert image to RGB before saving as JPEG
-        resized_image = resized_image.convert("RGB")
+        # Resize image before displaying and analyzing (decoded once per distinct image)
+        renditions = image_pipeline.prepare(uploaded_image)
+        memory_governor.touch(session_id, derived=[renditions])
 
         # Display the resized image
-        st.image(resized_image, caption="Uploaded Image", use_container_width=True)
+        st.image(renditions.preview, caption="Uploaded Image", use_container_width=True)
+
+        image_hash = core.image_media_hash(renditions)
+        if image_hash != renditions.sha256:
+            st.caption("This looks like a copy of an image uploaded before, so answers about that image are reused.")
+            if st.checkbox("Analyze it as a new image"):
+                image_hash = renditions.sha256
 
         # Input for dynamic task
         task_input = st.text_area(
@@ -99,27 +514,53 @@ elif uploaded_image:
 
         # Button to process the image and task
         if st.button("Analyze Image") and task_input:
-            with st.spinner("AI is thinking... 🤖"):
-                try:
-                    # Save the resized image in a temporary path (convert to RGB before saving)
-                    temp_image_path = tempfile.mktemp(suffix='.jpg')
-                    resized_image.save(temp_image_path)
-
-                    response = agent.run(task_input, images=[temp_image_path])
-
-                    # Display the response from the model
-                    st.markdown("### AI Response:")
-                    st.markdown(response.content)
-                except Exception as e:
-                    st.error(f"An error occurred during analysis: {str(e)}")
-                finally:
-                    # Clean up temp file
-                    if os.path.exists(temp_image_path):
-                        os.unlink(temp_image_path)
+            def run_image_analysis(job, **run_kwargs):
+                return core.run_image(renditions, task_input, **run_kwargs)
+
+            start_analysis(image_hash, task_input, "AI is thinking... 🤖", run_image_analysis,
+                           kind="image", thumbnail=make_thumbnail(renditions.preview))
+
+        # Display the response from the model
+        if st.session_state.get("analysis", {}).get("media") == image_hash:
+            st.markdown("### AI Response:")
+            show_analysis(image_hash)
 
     except Exception as e:
         st.error(f"An error occurred while processing the image: {str(e)}")
+elif uploaded_images:
+    media_store.release(session_id, "video")
+    try:
+        named_renditions = [(image.name, image_pipeline.prepare(image)) for image in uploaded_images]
+        memory_governor.touch(session_id, derived=[renditions for _, renditions in named_renditions])
+        st.image([renditions.preview for _, renditions in named_renditions],
+                 caption=[name for name, _ in named_renditions], width=160)
+        # The set of images, in upload order, identifies the batch analysis
+        batch_hash = hashlib.sha256(
+            "".join(core.image_media_hash(renditions) for _, renditions in named_renditions).encode()
+        ).hexdigest()
+
+        task_input = st.text_area(
+            f"Enter your task/question for the AI Agent, asked about each of the {len(named_renditions)} images:"
+        )
+
+        # Several images share each model call, and every image gets its own answer
+        if st.button("Analyze Images") and task_input:
+            def run_batch_analysis(job, **run_kwargs):
+                for name, answer, cached in analyze_images(core, named_renditions, task_input):
+                    yield f"#### {name}\n\n{answer}\n\n"
+
+            start_analysis(batch_hash, task_input, f"Analyzing {len(named_renditions)} images...",
+                           run_batch_analysis, variant=":batch", kind="images",
+                           thumbnail=make_thumbnail(named_renditions[0][1].preview))
+
+        if st.session_state.get("analysis", {}).get("media") == batch_hash:
+            st.markdown("### AI Responses:")
+            show_analysis(batch_hash)
+
+    except Exception as e:
+        st.error(f"An error occurred while processing the images: {str(e)}")
 else:
+    media_store.release(session_id, "video")
     st.info("Please upload a video or image to begin analysis.")
 
 st.markdown("""
@@ -0,0 +1,47 @@
+import numpy as np
+from PIL import Image
+
+HASH_SIZE = 8
+# pHash looks at the lowest frequencies of a 32x32 DCT
+PHASH_SAMPLE = 32
+
+_BIT_WEIGHTS = 1 << np.arange(HASH_SIZE * HASH_SIZE, dtype=np.uint64)
+
+
+def _pack(bits):
+    # 64 booleans to a Python int, least significant bit first
+    return int(np.sum(_BIT_WEIGHTS[bits.ravel()], dtype=np.uint64))
+
+
+def _gray(image, size):
+    # Box-filtered grayscale downscale, so resampling noise (re-saves, screenshots) averages out
+    small = image.convert("L").resize(size, Image.Resampling.BOX)
+    return np.asarray(small, dtype=np.float32)
+
+
+def dhash(image, size=HASH_SIZE):
+    # Horizontal gradient signs on a (size+1) x size thumbnail
+    pixels = _gray(image, (size + 1, size))
+    return _pack(pixels[:, 1:] > pixels[:, :-1])
+
+
+def _dct_matrix(n):
+    k = np.arange(n)[:, None]
+    i = np.arange(n)[None, :]
+    matrix = np.cos(np.pi * (2 * i + 1) * k / (2 * n)) * np.sqrt(2 / n)
+    matrix[0] /= np.sqrt(2)
+    return matrix.astype(np.float32)
+
+
+_DCT = _dct_matrix(PHASH_SAMPLE)
+
+
+def phash(image, size=HASH_SIZE):
+    # Sign of the low-frequency DCT coefficients against their median (DC term excluded)
+    pixels = _gray(image, (PHASH_SAMPLE, PHASH_SAMPLE))
+    low = (_DCT @ pixels @ _DCT.T)[:size, :size]
+    return _pack(low > np.median(low.ravel()[1:]))
+
+
+def image_hashes(image):
+    return phash(image), dhash(image)
@@ -0,0 +1,83 @@
+import threading
+import time
+from collections import OrderedDict
+
+from metrics import span
+from singleflight import SingleFlight
+
+DEFAULT_TTL = 60 * 60
+
+
+def normalize_query(query):
+    return " ".join(query.split()).casefold()
+
+
+class SearchCache:
+    """TTL/LRU cache in front of a web search backend.
+
+    Identical queries issued concurrently from different sessions share a
+    single outbound request.
+    """
+
+    def __init__(self, ttl=DEFAULT_TTL, max_entries=1024, clock=time.monotonic):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.clock = clock
+        self.hits = 0
+        self.misses = 0
+        self.saved_seconds = 0.0
+        self._entries = OrderedDict()
+        self._flight = SingleFlight()
+        self._lock = threading.Lock()
+
+    def lookup(self, kind, query, max_results, fetch):
+        # fetch() performs the real search; results are cached per (kind, normalized query, max_results)
+        key = (kind, normalize_query(query), max_results)
+        with span("search", kind=kind) as search:
+            return self._lookup(key, fetch, search)
+
+    def _lookup(self, key, fetch, search):
+        now = self.clock()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and now - entry[0] <= self.ttl:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                self.saved_seconds += entry[2]
+                search.cache_hit = True
+                return entry[1]
+
+        result, shared = self._flight.do(key, lambda: self._fetch(key, fetch))
+        search.cache_hit = shared
+        if shared:
+            # Rode along on another session's request
+            with self._lock:
+                self.hits += 1
+                entry = self._entries.get(key)
+                if entry is not None:
+                    self.saved_seconds += entry[2]
+        return result
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "coalesced": self._flight.coalesced,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "saved_seconds": self.saved_seconds,
+            }
+
+    def _fetch(self, key, fetch):
+        start = self.clock()
+        result = fetch()
+        elapsed = self.clock() - start
+        with self._lock:
+            self.misses += 1
+            self._entries[key] = (self.clock(), result, elapsed)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return result
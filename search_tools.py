@@ -0,0 +1,37 @@
+from phi.tools.duckduckgo import DuckDuckGo
+
+
+class CachedDuckDuckGo(DuckDuckGo):
+    """DuckDuckGo toolkit whose searches go through a shared SearchCache."""
+
+    def __init__(self, cache, **kwargs):
+        self.cache = cache
+        super().__init__(**kwargs)
+
+    def duckduckgo_search(self, query: str, max_results: int = 5) -> str:
+        """Use this function to search DuckDuckGo for a query.
+
+        Args:
+            query(str): The query to search for.
+            max_results (optional, default=5): The maximum number of results to return.
+
+        Returns:
+            The result from DuckDuckGo.
+        """
+        return self.cache.lookup(
+            "text", query, max_results, lambda: super(CachedDuckDuckGo, self).duckduckgo_search(query, max_results)
+        )
+
+    def duckduckgo_news(self, query: str, max_results: int = 5) -> str:
+        """Use this function to get the latest news from DuckDuckGo.
+
+        Args:
+            query(str): The query to search for.
+            max_results (optional, default=5): The maximum number of results to return.
+
+        Returns:
+            The latest news from DuckDuckGo.
+        """
+        return self.cache.lookup(
+            "news", query, max_results, lambda: super(CachedDuckDuckGo, self).duckduckgo_news(query, max_results)
+        )
@@ -0,0 +1,51 @@
+import time
+from dataclasses import dataclass
+
+MIN_RENDER_INTERVAL = 0.1
+# Longer answers cost more to re-parse, so re-render them less often
+RENDER_CHARS_PER_SECOND = 20000
+CURSOR = "▌"
+
+
+@dataclass
+class StreamResult:
+    content: str
+    time_to_first_token: float
+    total_time: float
+    renders: int
+
+
+def chunk_text(chunk):
+    content = getattr(chunk, "content", chunk)
+    return content if isinstance(content, str) else ""
+
+
+def render_stream(chunks, placeholder, min_interval=MIN_RENDER_INTERVAL, clock=time.perf_counter):
+    # Render incremental agent output into a Streamlit placeholder, debouncing the markdown re-renders
+    start = clock()
+    first_token_at = None
+    last_render = 0.0
+    renders = 0
+    parts = []
+    length = 0
+
+    for chunk in chunks:
+        text = chunk_text(chunk)
+        if not text:
+            continue
+        now = clock()
+        if first_token_at is None:
+            first_token_at = now
+        parts.append(text)
+        length += len(text)
+        interval = max(min_interval, length / RENDER_CHARS_PER_SECOND)
+        if now - last_render >= interval:
+            placeholder.markdown("".join(parts) + CURSOR)
+            last_render = now
+            renders += 1
+
+    content = "".join(parts)
+    placeholder.markdown(content)
+    end = clock()
+    ttft = (first_token_at if first_token_at is not None else end) - start
+    return StreamResult(content, ttft, end - start, renders + 1)
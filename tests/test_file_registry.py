@@ -0,0 +1,68 @@
+import pytest
+
+from fakes import FakeFileBackend
+from file_registry import FileRegistry
+
+
+@pytest.fixture
+def backend():
+    return FakeFileBackend(processing_polls=0)
+
+
+def video(tmp_path, name, data=b"video"):
+    path = tmp_path / name
+    path.write_bytes(data)
+    return path
+
+
+def test_same_digest_is_uploaded_once(tmp_path, backend, clock):
+    registry = FileRegistry(backend, clock=clock)
+    path = video(tmp_path, "a.mp4")
+    first = registry.get_or_upload(path, "a")
+    second = registry.get_or_upload(path, "a")
+    assert second.name == first.name
+    assert backend.uploads == 1
+    assert registry.stats() == {"entries": 1, "hits": 1, "misses": 1}
+
+
+def test_digest_defaults_to_file_hash(tmp_path, backend, clock):
+    registry = FileRegistry(backend, clock=clock)
+    registry.get_or_upload(video(tmp_path, "a.mp4"))
+    registry.get_or_upload(video(tmp_path, "copy.mp4"))
+    assert backend.uploads == 1
+
+
+def test_entry_expires_before_remote_file(tmp_path, backend, clock):
+    registry = FileRegistry(backend, ttl=100, clock=clock)
+    path = video(tmp_path, "a.mp4")
+    registry.get_or_upload(path, "a")
+    clock.advance(89)
+    registry.get_or_upload(path, "a")
+    assert backend.uploads == 1
+    # Past 90% of the remote TTL the handle is no longer trusted
+    clock.advance(2)
+    registry.get_or_upload(path, "a")
+    assert backend.uploads == 2
+
+
+def test_least_recently_used_entry_is_evicted(tmp_path, backend, clock):
+    registry = FileRegistry(backend, max_entries=2, clock=clock)
+    paths = {name: video(tmp_path, f"{name}.mp4", name.encode()) for name in "abc"}
+    registry.get_or_upload(paths["a"], "a")
+    registry.get_or_upload(paths["b"], "b")
+    registry.get_or_upload(paths["a"], "a")
+    registry.get_or_upload(paths["c"], "c")
+    assert backend.uploads == 3
+    registry.get_or_upload(paths["a"], "a")
+    assert backend.uploads == 3
+    registry.get_or_upload(paths["b"], "b")
+    assert backend.uploads == 4
+
+
+def test_missing_remote_file_is_uploaded_again(tmp_path, backend, clock):
+    registry = FileRegistry(backend, clock=clock)
+    path = video(tmp_path, "a.mp4")
+    handle = registry.get_or_upload(path, "a")
+    backend.delete(handle.name)
+    assert registry.get_or_upload(path, "a").name != handle.name
+    assert backend.uploads == 2
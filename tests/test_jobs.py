@@ -0,0 +1,94 @@
+import threading
+import time
+
+import pytest
+
+from jobs import CANCELLED, DONE, JobLimitError, JobQueue
+
+
+def wait_for(job, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not job.finished:
+        assert time.monotonic() < deadline, f"job still {job.status}"
+        time.sleep(0.01)
+
+
+@pytest.fixture
+def release():
+    event = threading.Event()
+    yield event
+    event.set()
+
+
+def blocked(job, release, calls=None):
+    if calls is not None:
+        calls.append(job.id)
+    release.wait(5)
+    job.check_cancelled()
+    return "answer"
+
+
+def test_per_owner_limit(release):
+    queue = JobQueue(per_owner_limit=2)
+    queue.submit("s1", "one", blocked, release)
+    queue.submit("s1", "two", blocked, release)
+    with pytest.raises(JobLimitError):
+        queue.submit("s1", "three", blocked, release)
+    # Other sessions are not held back by s1
+    queue.submit("s2", "one", blocked, release)
+
+
+def test_finished_jobs_free_the_owner_slot(release):
+    queue = JobQueue(per_owner_limit=1)
+    release.set()
+    wait_for(queue.submit("s1", "one", blocked, release))
+    wait_for(queue.submit("s1", "two", blocked, release))
+
+
+def test_server_wide_limit(release):
+    queue = JobQueue(max_queued=2)
+    queue.submit("s1", "one", blocked, release)
+    queue.submit("s2", "one", blocked, release)
+    with pytest.raises(JobLimitError):
+        queue.submit("s3", "one", blocked, release)
+
+
+def test_identical_submissions_share_one_job(release):
+    queue = JobQueue()
+    calls = []
+    first = queue.submit("s1", "analyze", blocked, release, calls, coalesce_key="k")
+    second = queue.submit("s2", "analyze", blocked, release, calls, coalesce_key="k")
+    assert second is first
+    assert first.owners == {"s1", "s2"}
+    assert queue.coalesced == 1
+    release.set()
+    wait_for(first)
+    assert first.status == DONE and first.result == "answer"
+    assert len(calls) == 1
+
+
+def test_resubmitting_from_the_same_owner_returns_its_job(release):
+    queue = JobQueue(per_owner_limit=1)
+    first = queue.submit("s1", "analyze", blocked, release, coalesce_key="k")
+    assert queue.submit("s1", "analyze", blocked, release, coalesce_key="k") is first
+
+
+def test_finished_job_is_not_joined(release):
+    queue = JobQueue()
+    release.set()
+    first = queue.submit("s1", "analyze", blocked, release, coalesce_key="k")
+    wait_for(first)
+    assert queue.submit("s2", "analyze", blocked, release, coalesce_key="k") is not first
+
+
+def test_shared_job_runs_until_its_last_owner_cancels(release):
+    queue = JobQueue()
+    job = queue.submit("s1", "analyze", blocked, release, coalesce_key="k")
+    queue.submit("s2", "analyze", blocked, release, coalesce_key="k")
+    queue.cancel(job.id, "s1")
+    assert not job.cancel_requested
+    queue.cancel(job.id, "s2")
+    assert job.cancel_requested
+    release.set()
+    wait_for(job)
+    assert job.status == CANCELLED
@@ -0,0 +1,81 @@
+from pathlib import Path
+
+import pytest
+
+from media_store import MediaStore
+
+
+@pytest.fixture
+def store(tmp_path, clock):
+    return MediaStore(tmp_path / "media", quota_bytes=100, clock=clock)
+
+
+def cached_file(tmp_path, name, size=60):
+    path = tmp_path / name
+    path.write_bytes(b"x" * size)
+    return path
+
+
+def test_rerun_reuses_the_stored_upload(store):
+    first = store.acquire_bytes("s1", "video", "upload-1", b"a" * 10)
+    second = store.acquire_bytes("s1", "video", "upload-1", b"a" * 10)
+    assert second == first
+    assert store.stats()["bytes_written"] == 10
+
+
+def test_identical_uploads_are_stored_once(store):
+    first = store.acquire_bytes("s1", "video", "upload-1", b"a" * 10)
+    second = store.acquire_bytes("s2", "video", "upload-2", b"a" * 10)
+    assert second.path == first.path
+    assert store.stats()["files"] == 1
+    assert store.total_bytes == 10
+
+
+def test_held_files_survive_the_quota(store):
+    held = store.acquire_bytes("s1", "video", "upload-1", b"a" * 60)
+    store.acquire_bytes("s2", "video", "upload-2", b"b" * 60)
+    assert Path(held.path).exists()
+    assert store.total_bytes == 120
+
+
+def test_released_file_stays_cached_until_the_quota_needs_room(store):
+    first = store.acquire_bytes("s1", "video", "upload-1", b"a" * 60)
+    store.release("s1", "video")
+    assert Path(first.path).exists()
+    store.acquire_bytes("s1", "video", "upload-2", b"b" * 60)
+    assert not Path(first.path).exists()
+    assert store.total_bytes == 60
+
+
+def test_replacing_a_slot_releases_the_previous_upload(store):
+    first = store.acquire_bytes("s1", "video", "upload-1", b"a" * 60)
+    second = store.acquire_bytes("s1", "video", "upload-2", b"b" * 60)
+    assert not Path(first.path).exists()
+    assert Path(second.path).exists()
+
+
+def test_unheld_cached_files_are_evicted_least_recently_used(store, tmp_path, clock):
+    first = store.add_cached_file(cached_file(tmp_path, "first.mp4"))
+    clock.advance(1)
+    second = store.add_cached_file(cached_file(tmp_path, "second.mp4"))
+    assert not Path(first.path).exists()
+    assert Path(second.path).exists()
+
+
+def test_held_segments_are_not_evicted_until_released(store, tmp_path, clock):
+    # Regression: segments added without a holder were deleted by the quota before they were analyzed
+    first = store.add_cached_file(cached_file(tmp_path, "seg-0.mp4"), "job-1", "seg-0.mp4")
+    clock.advance(1)
+    second = store.add_cached_file(cached_file(tmp_path, "seg-1.mp4"), "job-1", "seg-1.mp4")
+    assert Path(first.path).exists() and Path(second.path).exists()
+    store.release_session("job-1")
+    assert not Path(first.path).exists()
+    assert Path(second.path).exists()
+    assert store.total_bytes == 60
+
+
+def test_idle_sessions_are_swept(store, clock):
+    store.acquire_bytes("s1", "video", "upload-1", b"a" * 10)
+    clock.advance(store.session_idle_seconds + 1)
+    assert store.sweep_idle_sessions() == 1
+    assert store.stats()["sessions"] == 0
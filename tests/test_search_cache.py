@@ -0,0 +1,63 @@
+import threading
+
+from fakes import FakeSearchBackend
+from search_cache import SearchCache
+
+
+def lookup(cache, backend, query, max_results=5):
+    return cache.lookup("text", query, max_results, lambda: backend.search(query, max_results))
+
+
+def test_repeated_query_is_served_from_cache(clock):
+    backend = FakeSearchBackend(latency=0)
+    cache = SearchCache(clock=clock)
+    first = lookup(cache, backend, "beam deflection")
+    # Whitespace and case don't make a new query
+    assert lookup(cache, backend, "  Beam   DEFLECTION ") == first
+    assert backend.calls == 1
+    assert cache.stats()["hits"] == 1
+
+
+def test_max_results_is_part_of_the_key(clock):
+    backend = FakeSearchBackend(latency=0)
+    cache = SearchCache(clock=clock)
+    lookup(cache, backend, "beam", 5)
+    lookup(cache, backend, "beam", 10)
+    assert backend.calls == 2
+
+
+def test_entries_expire_after_ttl(clock):
+    backend = FakeSearchBackend(latency=0)
+    cache = SearchCache(ttl=60, clock=clock)
+    lookup(cache, backend, "beam")
+    clock.advance(60)
+    lookup(cache, backend, "beam")
+    assert backend.calls == 1
+    clock.advance(1)
+    lookup(cache, backend, "beam")
+    assert backend.calls == 2
+
+
+def test_least_recently_used_entry_is_evicted(clock):
+    backend = FakeSearchBackend(latency=0)
+    cache = SearchCache(max_entries=2, clock=clock)
+    for query in ("a", "b", "a", "c"):
+        lookup(cache, backend, query)
+    assert backend.calls == 3
+    lookup(cache, backend, "a")
+    assert backend.calls == 3
+    lookup(cache, backend, "b")
+    assert backend.calls == 4
+
+
+def test_concurrent_identical_queries_share_one_request():
+    backend = FakeSearchBackend(latency=0.2)
+    cache = SearchCache()
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(lookup(cache, backend, "beam"))) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert backend.calls == 1
+    assert len(set(results)) == 1
@@ -0,0 +1,185 @@
+import os
+import re
+import subprocess
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+
+# Media store session under which transcoded files are held while callers still need them
+HOLD_SESSION = "transcoder"
+
+
+@dataclass(frozen=True)
+class TranscodeCaps:
+    max_height: int = int(os.getenv("TRANSCODE_MAX_HEIGHT", 720))
+    max_fps: float = float(os.getenv("TRANSCODE_MAX_FPS", 30))
+    max_video_kbps: int = int(os.getenv("TRANSCODE_MAX_VIDEO_KBPS", 2000))
+    audio_kbps: int = 96
+
+    @property
+    def key(self):
+        return f"{self.max_height}p{self.max_fps:g}fps{self.max_video_kbps}k"
+
+
+@dataclass
+class TranscodeResult:
+    path: str
+    key: str
+    source_bytes: int
+    output_bytes: int
+    skipped: bool
+
+
+def stream_kbps(path):
+    # {"Video": kb/s, "Audio": kb/s} for the first stream of each kind ffmpeg reports a bitrate for
+    import imageio_ffmpeg
+
+    info = subprocess.run(
+        [imageio_ffmpeg.get_ffmpeg_exe(), "-hide_banner", "-i", str(path)],
+        capture_output=True, text=True, errors="replace",
+    ).stderr
+    rates = {}
+    for kind, details in re.findall(r"Stream #.*?: (Video|Audio): (.*)", info):
+        match = re.search(r"(\d+) kb/s", details)
+        if match:
+            rates.setdefault(kind, int(match.group(1)))
+    return rates
+
+
+def source_stats(path):
+    from keyframes import probe
+
+    meta = probe(path)
+    size = os.path.getsize(path)
+    duration = meta.get("duration") or 0.0
+    total_kbps = size * 8 / duration / 1000 if duration else 0.0
+    # The cap is on the video stream; containers that don't report it (e.g. MKV) get the total minus audio
+    rates = stream_kbps(path)
+    kbps = rates.get("Video", max(total_kbps - rates.get("Audio", 0), 0.0))
+    return meta["size"], meta.get("fps") or 0.0, kbps, size
+
+
+def within_caps(dimensions, fps, kbps, caps):
+    return dimensions[1] <= caps.max_height and fps <= caps.max_fps and kbps <= caps.max_video_kbps
+
+
+def ffmpeg_args(source, target, fps, caps):
+    import imageio_ffmpeg
+
+    filters = [f"scale=-2:'min({caps.max_height},ih)'"]
+    if fps > caps.max_fps:
+        filters.append(f"fps={caps.max_fps:g}")
+    return [
+        imageio_ffmpeg.get_ffmpeg_exe(), "-y", "-loglevel", "error",
+        "-i", str(source),
+        "-vf", ",".join(filters),
+        "-c:v", "libx264", "-preset", "veryfast",
+        "-b:v", f"{caps.max_video_kbps}k",
+        "-maxrate", f"{caps.max_video_kbps}k",
+        "-bufsize", f"{caps.max_video_kbps * 2}k",
+        "-c:a", "aac", "-b:a", f"{caps.audio_kbps}k",
+        "-movflags", "+faststart",
+        str(target),
+    ]
+
+
+def run_ffmpeg(args, target):
+    # ffmpeg does the work in its own process; write to a side file so a crash never leaves a half-written cache entry
+    partial = f"{target}.partial.mp4"
+    subprocess.run(args[:-1] + [partial], check=True, capture_output=True)
+    os.replace(partial, target)
+    return target
+
+
+class Transcoder:
+    """Caps resolution, frame rate and bitrate of videos before upload.
+
+    ffmpeg runs from a small thread pool; outputs are cached on disk by
+    source hash and caps, and sources already under the caps are passed
+    through as is. Given a media store, cached outputs count toward its
+    disk quota and are evicted with its other unreferenced files, but only
+    once every caller of submit() for that source has called release().
+    """
+
+    def __init__(self, cache_dir, caps=None, max_workers=2, media_store=None):
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.caps = caps or TranscodeCaps()
+        self.media_store = media_store
+        # Threads, not processes: each job only waits on ffmpeg, and forking a threaded server is unsafe
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="transcode")
+        self._pending = {}
+        # key -> callers between submit() and release()
+        self._holders = {}
+        # Keys whose re-encode came out no smaller than the source
+        self._no_gain = set()
+        self._lock = threading.Lock()
+
+    def submit(self, source, source_digest):
+        # Every call must be paired with release(source_digest) once the output has been read
+        key = self._key(source_digest)
+        with self._lock:
+            self._holders[key] = self._holders.get(key, 0) + 1
+            future = self._pending.get(key)
+            if future is not None:
+                return future
+            future = Future()
+            self._pending[key] = future
+        try:
+            self._start(source, key, future)
+        except Exception as e:
+            future.set_exception(e)
+        future.add_done_callback(lambda _: self._forget(key))
+        return future
+
+    def release(self, source_digest):
+        key = self._key(source_digest)
+        with self._lock:
+            holders = self._holders.get(key, 0) - 1
+            if holders > 0:
+                self._holders[key] = holders
+                return
+            self._holders.pop(key, None)
+            # Under the lock, so a submit() racing this can't have its fresh hold released
+            if self.media_store is not None:
+                self.media_store.release(HOLD_SESSION, key)
+
+    def _key(self, source_digest):
+        return f"{source_digest}-{self.caps.key}"
+
+    def _start(self, source, key, future):
+        dimensions, fps, kbps, source_bytes = source_stats(source)
+        passthrough = TranscodeResult(str(source), key, source_bytes, source_bytes, True)
+        if key in self._no_gain or within_caps(dimensions, fps, kbps, self.caps):
+            future.set_result(passthrough)
+            return
+        target = self.cache_dir / f"{key}.mp4"
+        if target.exists():
+            future.set_result(self._result(source, target, key, source_bytes) or passthrough)
+            return
+
+        def finished(job):
+            if job.exception() is not None:
+                future.set_exception(job.exception())
+                return
+            future.set_result(self._result(source, target, key, source_bytes) or passthrough)
+
+        self._pool.submit(run_ffmpeg, ffmpeg_args(source, target, fps, self.caps), str(target)).add_done_callback(finished)
+
+    def _result(self, source, target, key, source_bytes):
+        # The cached output, or None when re-encoding did not make it smaller and the original should be uploaded
+        output_bytes = target.stat().st_size
+        if output_bytes >= source_bytes:
+            target.unlink(missing_ok=True)
+            with self._lock:
+                self._no_gain.add(key)
+            return None
+        if self.media_store is not None:
+            # Held until the last caller releases it, so the quota can't delete it before the upload
+            self.media_store.add_cached_file(target, HOLD_SESSION, key)
+        return TranscodeResult(str(target), key, source_bytes, output_bytes, False)
+
+    def _forget(self, key):
+        with self._lock:
+            self._pending.pop(key, None)